@@ -1,17 +1,35 @@
+import asyncio
 import logging
 import re
+import time
 from pathlib import Path
 from datetime import datetime
-from typing import TYPE_CHECKING, List, Optional
+from typing import TYPE_CHECKING, Dict, Iterable, List, Optional, Tuple
 
 import aiohttp
 import discord
 import humanize
+import psutil
 import steam
 from discord.ext import commands, tasks
 
+from cogs.utils import backfill
+from cogs.utils import preferences as preferences_utils
 from cogs.utils.context import Context
+from cogs.utils.dashboard import Broadcaster, Dashboard
+from cogs.utils.converters import SteamBotIndex
 from cogs.utils.formats import human_join
+from cogs.utils.inventory import Inventories
+from cogs.utils.outbox import Outbox
+from cogs.utils.prices import PriceHistory, price_point, totals
+from cogs.utils.profit import Profits
+from cogs.utils.rules import NOTHING, RelayRules, Verdict
+from cogs.utils.scheduler import Priority, Scheduler
+from cogs.utils import state, tracing
+from cogs.utils.state import Profile, Profiles
+from cogs.utils.supervisor import SteamSupervisor
+from cogs.utils.telemetry import CommandTelemetry
+from cogs.utils.trades import Trade, TradeLog, TradeMessage, TradeMessages
 
 try:
     import config.preferences as preferences
@@ -37,8 +55,25 @@ class SteamClient(steam.Client):
         else:
             super().__init__()
         self.bot = bot
-        self.steam_bots: Optional[List[steam.User]] = None
+        self._steam_bots: Optional[List[steam.User]] = None
+        self.steam_bot_index = SteamBotIndex()
         self.first = True
+        self.trade_messages = TradeMessages()
+        self.trade_log = TradeLog()
+        self.inventories = Inventories()
+        self.prices = PriceHistory()
+        self.profits = Profits()
+        self.profiles = Profiles()
+        self.fingerprints = backfill.Fingerprints()
+
+    @property
+    def steam_bots(self) -> Optional[List[steam.User]]:
+        return self._steam_bots
+
+    @steam_bots.setter
+    def steam_bots(self, steam_bots: List[steam.User]) -> None:
+        self._steam_bots = steam_bots
+        self.steam_bot_index = SteamBotIndex(steam_bots, custom_urls=self.steam_bot_index.custom_urls)
 
     async def on_ready(self) -> None:
         log.debug("Steam Client is ready")
@@ -47,9 +82,47 @@ class SteamClient(steam.Client):
         print("Username:", self.user.name)
         print("ID:", self.user.id64)
         print("------------")
-        self.steam_bots = [
-            self.get_user(steam_bot) for steam_bot in preferences.bots_steam_ids
-        ]
+        self.bot.supervisor.mark_up()
+        self.steam_bots = await self.fetch_steam_bots(self.bot.preferences.bots_steam_ids)
+        for steam_bot in self.steam_bots:
+            self.loop.create_task(self.inventories.refresh(steam_bot))
+        if self.fingerprints.latest is not None:  # there's nothing to compare against on the very first run
+            self.loop.create_task(self.backfill())
+
+    async def backfill(self) -> None:
+        """Relay anything the bots said while we weren't connected, oldest first."""
+        after = datetime.utcfromtimestamp(
+            max(self.fingerprints.latest - backfill.SLOP, time.time() - backfill.MAX_AGE)
+        )
+        missed: List[backfill.HistoryMessage] = []
+        for steam_bot in self.steam_bots:
+            if steam_bot == self.user:  # there's no chat with ourselves to read
+                continue
+            try:
+                messages = await backfill.recent_messages(self, steam_bot, after)
+            except Exception as exc:
+                log.warning(f"Couldn't fetch the chat history of {steam_bot}", exc_info=exc)
+                continue
+            missed.extend(message for message in messages if message not in self.fingerprints)
+        if not missed:
+            return
+        log.info(f"Relaying {len(missed)} messages that were missed while disconnected")
+        for message in sorted(missed, key=backfill.timestamp):
+            if message not in self.fingerprints:  # it might have come in live while we were relaying
+                await self.on_message(message)
+
+    async def on_disconnect(self) -> None:
+        await self.bot.supervisor.disconnected()
+
+    async def fetch_steam_bots(self, ids: Iterable[int]) -> List[steam.User]:
+        steam_bots = []
+        for steam_bot in ids:
+            user = self.get_user(steam_bot) or await self.fetch_user(steam_bot)
+            if user is None:
+                log.warning(f"Couldn't find the steam bot with the id {steam_bot}")
+            else:
+                steam_bots.append(user)
+        return steam_bots
 
     @tasks.loop(minutes=10)
     async def user_message(self, message):
@@ -69,7 +142,7 @@ class SteamClient(steam.Client):
             ),
         )
         if self.first:
-            self.bot.pins = []
+            self.first = False
             for owner in self.bot.owners:
                 message = await owner.send(embed=embed)
                 try:
@@ -77,103 +150,287 @@ class SteamClient(steam.Client):
                 except discord.HTTPException:
                     pass
                 else:
-                    self.bot.messages.append(message)
+                    self.bot.messages.append((message.channel.id, message.id))
         else:
             for channel in self.bot.channels:
                 await channel.send(embed=embed)
 
     async def on_message(self, message: steam.Message):
-        if message.author in self.steam_bots:
+        if message.author in self.steam_bot_index:
             log.info(f"Received a message from {message.author}")
+            self.fingerprints.add(message)
             if message.content.startswith("Message from"):  # we have a user message
                 log.debug("Starting a user message loop")
                 self.user_message.cancel()
                 self.user_message.start(message)
             else:
                 if message.content.startswith("Trade "):
-                    await self.send_trade_info(message)
+                    kind = "trade"
                 elif message.content.startswith("Offer "):
-                    await self.send_review_info(message)
+                    kind = "review"
                 else:
-                    embed = discord.Embed(
-                        color=self.bot.colour,
-                        title="New Message:",
-                        description=message.content,
-                    )
-                    embed.set_footer(
-                        text=datetime.now().strftime("%c"),
-                        icon_url=self.bot.user.avatar_url,
-                    )
-                    await self.send(embed=embed)
-
-    async def send_trade_info(self, message: steam.Message):
-        color = 0x5C7E10 if "accepted" in message.content else discord.Colour.red()
-        embed = discord.Embed(color=color)
-
-        trade_id, user_id = re.findall(r"\d+", message.content)
-        steam_id = steam.SteamID(int(user_id))
-        trader = (
-            await self.fetch_user(steam_id.id64) or steam_id
-        )  # api calls aren't that bad on steam
-        message = message.content.replace(f" #{trade_id}", "")
-        message = message.replace(
-            f"Trade with {user_id} is", f"A trade with {trader} has been marked as",
+                    kind = "message"
+                if kind == "trade" and self.native_trades and message.author == self.user:
+                    log.debug("Skipping a trade message that the trade offer events already relayed")
+                    return
+                timestamp = backfill.timestamp(message)
+                steam_delay = round((time.time() - timestamp) * 1000, 3)
+                with self.bot.tracer.trace(kind, bot=message.author.id64, steam_delay=steam_delay):
+                    await self.relay(message.author, message.content, kind, timestamp)
+
+    @property
+    def native_trades(self) -> bool:
+        """Whether trades on the account we're logged into come from Steam's trade offer events instead of chat.
+
+        Steam only tells us about offers on our own account, every other bot is still relayed from its messages.
+        """
+        return (
+            getattr(self.bot.preferences, "native_trades", False)
+            and self.user is not None
+            and self.user.id64 in self.bot.preferences.bots_steam_ids
         )
-        message = message.replace("Summary:", "\n__Summary:__")
-        message = message.replace("Asked:", "- **Asked:**")
-        message = message.replace("Offered:", "- **Offered:**")
-        embed.set_author(
-            name=f"Received a trade from: {trader}",
-            url=trader.community_url,
-            icon_url=trader.avatar_url if isinstance(trader, steam.User) else "",
+
+    async def on_trade_accept(self, trade: steam.TradeOffer) -> None:
+        await self.relay_trade_offer(trade, "accepted")
+
+    async def on_trade_decline(self, trade: steam.TradeOffer) -> None:
+        await self.relay_trade_offer(trade, "declined")
+
+    async def on_trade_cancel(self, trade: steam.TradeOffer) -> None:
+        await self.relay_trade_offer(trade, "canceled")
+
+    async def on_trade_expire(self, trade: steam.TradeOffer) -> None:
+        await self.relay_trade_offer(trade, "expired")
+
+    async def on_trade_counter(self, trade: steam.TradeOffer) -> None:
+        await self.relay_trade_offer(trade, "countered")
+
+    async def relay_trade_offer(self, trade: steam.TradeOffer, status: str) -> None:
+        """Relay a finished offer straight from Steam, the partner and items come with it so nothing needs
+        fetching or parsing. It's also written out like tf2automatic's trade messages for the rules and the embed."""
+        if not self.native_trades:
+            return
+        partner = trade.partner
+        if isinstance(partner, steam.User):
+            trader = self.profiles[partner.id64] = Profile.from_user(partner)
+        else:  # their profile is private
+            trader = self.profiles.get(partner.id64) or Profile.from_steam_id(partner)
+        info = Trade.from_offer(trade, status)
+        content = f"Trade #{trade.id} with {trader.id64} is {status}. Summary: {info.summary}"
+        log.info(f"Trade #{trade.id} with {trader} was {status}")
+        with self.bot.tracer.trace("trade", bot=self.user.id64, native=True):
+            await self.relay(self.user, content, "trade", time.time(), trade=info, trader=trader)
+
+    async def relay(
+        self,
+        author: steam.User,
+        content: str,
+        kind: str,
+        timestamp: float,
+        *,
+        trade: Optional[Trade] = None,
+        trader: Optional[Profile] = None,
+    ) -> None:
+        with tracing.span("rules"):
+            verdict = self.bot.relay_rules.match(kind, content)
+        self.bot.events.publish(
+            kind,
+            {
+                "timestamp": timestamp,
+                "author": str(author),
+                "content": content,
+                "muted": verdict.mute,
+            },
         )
-        embed.description = message
-        embed.set_footer(text=f"Trade #{trade_id}", icon_url=self.bot.user.avatar_url)
-        embed.timestamp = datetime.now()
-        await self.send(embed=embed)
+        if verdict.alert:
+            found = f", it mentions {human_join(verdict.alerts)}" if verdict.alerts else ""
+            await self.send(
+                f"{human_join([f'<@{owner_id}>' for owner_id in self.bot.owner_ids])} check this {kind}"
+                f" from {author}{found}",
+                priority=Priority.REVIEW,
+            )
+        if kind == "trade":
+            await self.send_trade_info(author, content, verdict, trade=trade, trader=trader)
+        elif kind == "review":
+            await self.send_review_info(content, verdict)
+        elif not verdict.mute:
+            embed = discord.Embed(
+                color=self.bot.colour,
+                title="New Message:",
+                description=content,
+            )
+            embed.set_footer(
+                text=datetime.now().strftime("%c"),
+                icon_url=self.bot.user.avatar_url,
+            )
+            await self.send(embed=embed, destinations=verdict.destinations(self.bot.destinations))
 
-    async def send_review_info(self, message: steam.Message):
-        if "not active" in message.content or "not exist" in message.content:
+    async def send_trade_info(
+        self,
+        author: steam.User,
+        content: str,
+        verdict: Verdict = NOTHING,
+        *,
+        trade: Optional[Trade] = None,
+        trader: Optional[Profile] = None,
+    ):
+        """Record and post a trade, ``trade`` is what happened in it if it came from Steam instead of a message."""
+        if trade is None:
+            with tracing.span("parse"):
+                trade = Trade.from_message(content)
+        self.trade_log.add(time.time(), author.id64, trade)
+        accepted = trade.status == "accepted"
+        if accepted:
+            self.inventories.mark_dirty(author.id64)
+            self.loop.create_task(self.inventories.refresh(author))
+            if trade.sides is not None:
+                price = price_point(*trade.sides)
+                if price is not None:
+                    self.prices.add(price)
+                self.profits.add(author.id64, trade.trader, totals(*trade.sides))
+
+        if trader is None:
+            trader = await self.fetch_trader(steam.SteamID(trade.trader))
+        with tracing.span("embed"):
+            color = 0x5C7E10 if accepted else discord.Colour.red()
+            embed = discord.Embed(color=color)
+            message = content.replace(f" #{trade.id}", "")
+            message = re.sub(
+                rf"Trade with (?:{trade.trader}|{steam.SteamID(trade.trader).id}) is",
+                f"A trade with {trader} has been marked as",
+                message,
+            )
+            message = message.replace("Summary:", "\n__Summary:__")
+            message = message.replace("Asked:", "- **Asked:**")
+            message = message.replace("Offered:", "- **Offered:**")
+            embed.set_author(
+                name=f"Received a trade from: {trader}",
+                url=trader.community_url,
+                icon_url=trader.avatar_url,
+            )
+            embed.description = message
+            embed.set_footer(text=f"Trade #{trade.id}", icon_url=self.bot.user.avatar_url)
+            embed.timestamp = datetime.now()
+        await self.send_trade_embed(
+            trade.id, embed, priority=Priority.TRADE, destinations=verdict.destinations(self.bot.destinations)
+        )
+        if self.bot.first_trade_after is None:
+            self.bot.first_trade_after = time.perf_counter() - self.bot.started
+            log.info(
+                f"Relayed the first trade {self.bot.first_trade_after:.2f}s after starting"
+                f" ({'warm' if self.bot.warm else 'cold'} start)"
+            )
+
+    async def fetch_trader(self, steam_id: steam.SteamID) -> Profile:
+        """A trader's profile, only calling the API if we haven't seen them recently, even across restarts."""
+        profile = self.profiles.get(steam_id.id64)
+        if profile is not None and profile.fresh:
+            return profile
+        with tracing.span("fetch_user"):
+            user = await self.fetch_user(steam_id.id64)  # api calls aren't that bad on steam
+        if user is None:
+            return profile or Profile.from_steam_id(steam_id)
+        profile = self.profiles[steam_id.id64] = Profile.from_user(user)
+        return profile
+
+    async def send_review_info(self, content: str, verdict: Verdict = NOTHING):
+        destinations = verdict.destinations(self.bot.destinations)
+        if not destinations:
+            return
+        if "not active" in content or "not exist" in content:
             embed = discord.Embed(
                 color=self.bot.colour,
                 title="Offer review status:",
-                description=message.content,
+                description=content,
             )
             embed.set_footer(
                 text=f'• {datetime.now().strftime("%c")}',
                 icon_url=self.bot.user.avatar_url,
             )
         else:
-            embed = discord.Embed(color=self.bot.colour)
-            trade_id, user_id = re.findall(r"\d+", message.content)
-            steam_id = steam.SteamID(int(user_id))
-            trader = (
-                await self.fetch_user(steam_id.id64) or steam_id
-            )  # api calls aren't that bad on steam
-            message = message.content.replace(f" #{trade_id}", "")
-            if trader is not None:
-                message = message.replace(
-                    f"Offer from {trader} is waiting for review",
-                    f"An offer (#{trade_id}) sent by {trader} ({trader.id64}) is"
-                    " waiting for review",
-                )
-                message = message.replace("Summary:", "\n__Summary:__")
-                message = message.replace("Asked:", "- **Asked:**")
-                message = message.replace("Offered:", "- **Offered:**")
-                embed.set_author(
-                    name=f"Offer from: {trader.name}",
-                    url=trader.community_url,
-                    icon_url=trader.avatar_url,
+            with tracing.span("parse"):
+                trade_id, user_id = re.findall(r"\d+", content)[:2]
+                steam_id = steam.SteamID(int(user_id))
+            trader = await self.fetch_trader(steam_id)
+            with tracing.span("embed"):
+                embed = discord.Embed(color=self.bot.colour)
+                message = content.replace(f" #{trade_id}", "")
+                if trader is not None:
+                    message = message.replace(
+                        f"Offer from {trader} is waiting for review",
+                        f"An offer (#{trade_id}) sent by {trader} ({trader.id64}) is"
+                        " waiting for review",
+                    )
+                    message = message.replace("Summary:", "\n__Summary:__")
+                    message = message.replace("Asked:", "- **Asked:**")
+                    message = message.replace("Offered:", "- **Offered:**")
+                    embed.set_author(
+                        name=f"Offer from: {trader.name}",
+                        url=trader.community_url,
+                        icon_url=trader.avatar_url,
+                    )
+                embed.description = message
+                embed.set_footer(
+                    text=f'Offer #{trade_id} • {datetime.now().strftime("%c")}',
+                    icon_url=self.bot.user.avatar_url,
                 )
-            embed.description = message
-            embed.set_footer(
-                text=f'Offer #{trade_id} • {datetime.now().strftime("%c")}',
-                icon_url=self.bot.user.avatar_url,
-            )
             await self.send(
-                f"{human_join([o.mention for o in self.bot.owners])} check this!"
+                f"{human_join([f'<@{owner_id}>' for owner_id in self.bot.owner_ids])} check this!",
+                priority=Priority.REVIEW,
+                destinations=destinations,
             )
-        await self.send(embed=embed)
+            return await self.send_trade_embed(
+                int(trade_id), embed, priority=Priority.REVIEW, destinations=destinations
+            )
+        await self.send(embed=embed, destinations=destinations)
+
+    async def send_trade_embed(
+        self,
+        trade_id: int,
+        embed: discord.Embed,
+        *,
+        priority: Priority,
+        destinations: Optional[List[Tuple[str, int]]] = None,
+    ) -> None:
+        """Edit the messages already posted for this trade and post new ones where it hasn't been posted yet."""
+        if destinations is None:
+            destinations = self.bot.destinations
+        if not destinations:  # the relay rules muted it
+            return
+        previous = self.trade_messages.get(trade_id) or []
+        posted = [(kind, id) for kind, id, *_ in previous]
+        futures = [
+            self.bot.outbox.put((kind, id), embed=embed, edit=(channel_id, message_id), priority=priority)
+            for kind, id, channel_id, message_id in previous
+        ]
+        missing = [tuple(destination) for destination in destinations if tuple(destination) not in posted]
+        futures += await self.send(embed=embed, priority=priority, destinations=missing)
+        self.bot.loop.create_task(
+            self.track_trade(trade_id, posted + missing, futures, [*previous, *[None] * len(missing)])
+        )
+
+    async def track_trade(
+        self,
+        trade_id: int,
+        destinations: List[Tuple[str, int]],
+        futures: List["asyncio.Future[Optional[discord.Message]]"],
+        previous: List[Optional[TradeMessage]],
+    ) -> None:
+        """Remember where a trade was posted.
+
+        An edit resolves to ``None`` unless its message had been deleted and was posted again, then the new message
+        replaces the dead one. A new post that resolves to ``None`` wasn't delivered so it isn't tracked, the next
+        update for the trade tries posting it again.
+        """
+        messages = await asyncio.gather(*futures)
+        tracked: List[TradeMessage] = []
+        for (kind, id), message, old in zip(destinations, messages, previous):
+            if message is not None:
+                tracked.append((kind, id, message.channel.id, message.id))
+            elif old is not None:
+                tracked.append(old)
+        if tracked and tracked != [old for old in previous if old is not None]:
+            self.trade_messages.add(trade_id, tracked)
 
     async def send(
         self,
@@ -181,21 +438,45 @@ class SteamClient(steam.Client):
         *,
         embed: discord.Embed = None,
         file: discord.File = None,
-    ):
-        for channel in self.bot.channels:
-            await channel.send(content, embed=embed, file=file)
+        priority: Priority = Priority.INFO,
+        destinations: Optional[List[Tuple[str, int]]] = None,
+    ) -> List["asyncio.Future[Optional[discord.Message]]"]:
+        if file is not None:  # files can't be journaled so they skip the outbox
+            for channel in self.bot.channels:
+                async with self.bot.scheduler.slot(priority):
+                    await channel.send(content, embed=embed, file=file)
+            return []
+        return [
+            self.bot.outbox.put(destination, content, embed=embed, priority=priority)
+            for destination in (self.bot.destinations if destinations is None else destinations)
+        ]
 
 
 class AutoCord(commands.Bot):
     def __init__(self):
+        self.started = time.perf_counter()
+        self.lean = getattr(preferences, "lean_mode", False)
+        if self.lean:
+            # only what the cogs actually use, commands, wait_for and reaction menus
+            options = dict(
+                intents=discord.Intents(
+                    guilds=True, guild_messages=True, dm_messages=True, guild_reactions=True, dm_reactions=True,
+                ),
+                member_cache_flags=discord.MemberCacheFlags.none(),
+                chunk_guilds_at_startup=False,
+                max_messages=100,
+            )
+        else:
+            options = dict(intents=discord.Intents.all())
         super().__init__(
             command_prefix=commands.when_mentioned_or("!"),
             case_insensitive=True,
             owner_ids=preferences.owner_ids,
             activity=discord.Activity(type=discord.ActivityType.watching, name="trades"),
-            intents=discord.Intents.all(),
+            **options,
         )
         self.client = SteamClient(bot=self)
+        self.supervisor = SteamSupervisor(self)
         self.first = True
 
         self.log: Optional[logging.Logger] = None
@@ -207,16 +488,144 @@ class AutoCord(commands.Bot):
         ]
         log.info(f"Extensions to be loaded are {human_join(self.initial_extensions)}")
         self.launch_time: datetime
-        self.messages: List[discord.Message] = []
+        self.messages: List[Tuple[int, int]] = []  # the channel and message ids of pinned user messages
+        self.preferences = preferences
+        self.preferences_modified = Path(preferences.__file__).stat().st_mtime
+        self.preferences_invalid: Optional[float] = None  # the modification time of a file that failed validation
         self.colour = discord.Colour(preferences.embed_colour)
+        self.relay_rules = RelayRules(getattr(preferences, "relay_rules", ()))
+        self.scheduler = Scheduler()
+        self.events = Broadcaster()
+        self.tracer = tracing.Tracer(getattr(preferences, "trace_sample_rate", 0.1))
+        self.telemetry = CommandTelemetry(getattr(preferences, "slow_command_threshold", 5))
+        self.before_invoke(self.telemetry.before_invoke)
+        self.after_invoke(self.telemetry.after_invoke)
+        port = getattr(preferences, "dashboard_port", None)
+        self.dashboard = Dashboard(self, port) if port is not None else None
+        self.outbox = Outbox(self, self.scheduler)
+        self._owners: Dict[int, discord.User] = {}
+        self._channels: Dict[int, discord.abc.Messageable] = {}
+        self.first_trade_after: Optional[float] = None
+        self.warm = self.restore_state()
 
     @property
     def owners(self) -> List[discord.User]:
-        return [self.get_user(owner_id) for owner_id in self.owner_ids]
+        return [self._owners.get(owner_id) or self.get_user(owner_id) for owner_id in self.owner_ids]
 
     @property
     def channels(self) -> List[discord.abc.Messageable]:
-        return [self.get_channel(preferences.channel_id)] or self.owners
+        channel = self.get_channel(self.preferences.channel_id)
+        return [channel] if channel is not None else self.owners
+
+    @property
+    def destinations(self) -> List[Tuple[str, int]]:
+        """The kind and id of everywhere relayed messages go, these stay valid while Discord is unreachable."""
+        if self.preferences.channel_id is not None:
+            return [("channel", self.preferences.channel_id)]
+        return [("user", owner_id) for owner_id in self.owner_ids]
+
+    async def get_destination(self, kind: str, id: int) -> Optional[discord.abc.Messageable]:
+        """Get a channel or user from the cache, falling back to fetching it once if it isn't cached."""
+        if kind == "channel":
+            channel = self.get_channel(id) or self._channels.get(id)
+            if channel is None:
+                channel = self._channels[id] = await self.fetch_channel(id)
+            return channel
+        user = self._owners.get(id) or self.get_user(id)
+        if user is None:
+            user = await self.fetch_user(id)
+            if id in self.owner_ids:
+                self._owners[id] = user
+        return user
+
+    @tasks.loop(seconds=10)
+    async def watch_preferences(self):
+        """Reload the preferences whenever the file changes so they can be changed without restarting."""
+        path = Path(self.preferences.__file__)
+        try:
+            modified = path.stat().st_mtime
+        except OSError:
+            return
+        if modified in (self.preferences_modified, self.preferences_invalid):
+            return
+        try:
+            new = await steam.utils.to_thread(preferences_utils.load, path)
+        except preferences_utils.PreferencesError as exc:
+            self.preferences_invalid = modified  # there's no point trying again until it's been edited
+            log.warning(f"Not reloading the preferences: {exc}")
+            await self.client.send(f"The preferences weren't reloaded as they aren't valid: {exc}")
+            return
+        try:
+            await self.apply_preferences(new)
+        except Exception as exc:  # anything escaping here would stop the loop for good
+            log.exception("Failed to apply the new preferences, trying again shortly", exc_info=exc)
+            return
+        self.preferences_modified = modified
+
+    async def apply_preferences(self, new) -> None:
+        old = self.preferences
+        steam_bots = None
+        if self.client.steam_bots is not None:  # only look them up if we've logged in to steam
+            steam_bots = await self.client.fetch_steam_bots(new.bots_steam_ids)
+
+        # swap everything without awaiting so nothing sees half old and half new values
+        self.preferences = new
+        self.owner_ids = set(new.owner_ids)
+        self.colour = discord.Colour(new.embed_colour)
+        self.relay_rules = RelayRules(getattr(new, "relay_rules", ()))
+        self.tracer.rate = getattr(new, "trace_sample_rate", 0.1)
+        self.telemetry.slow_after = getattr(new, "slow_command_threshold", 5)
+        self._owners = {id: owner for id, owner in self._owners.items() if id in self.owner_ids}
+        if steam_bots is not None:
+            self.client.steam_bots = steam_bots
+
+        if self.is_ready():
+            await self.fetch_owners()
+
+        changed = [
+            name
+            for name in dir(new)
+            if not name.startswith("_") and getattr(new, name) != getattr(old, name, None)
+        ]
+        log.info(f"Reloaded the preferences, {human_join(changed) or 'nothing'} changed")
+        needs_restart = [name for name in changed if name in preferences_utils.RESTART_REQUIRED]
+        if needs_restart:
+            log.warning(f"{human_join(needs_restart)} won't change until the bot is restarted")
+
+    def snapshot_state(self) -> dict:
+        return {
+            "first": self.first,
+            "client_first": self.client.first,
+            "messages": self.messages,
+            "profiles": [profile for profile in self.client.profiles if profile.fresh],
+            "fingerprints": self.client.fingerprints.to_dict(),
+        }
+
+    def restore_state(self) -> bool:
+        """Pick up where the last run left off, returning whether there was anything to restore."""
+        snapshot = state.load()
+        if snapshot is None:
+            return False
+        self.first = snapshot["first"]
+        self.client.first = snapshot["client_first"]
+        self.messages = [tuple(message) for message in snapshot["messages"]]
+        for profile in snapshot["profiles"]:
+            profile = Profile(*profile)
+            if profile.fresh:
+                self.client.profiles[profile.id64] = profile
+        if "fingerprints" in snapshot:
+            self.client.fingerprints.update(snapshot["fingerprints"])
+        log.info(f"Restored the state from {datetime.fromtimestamp(snapshot['saved']):%c}")
+        return True
+
+    @tasks.loop(minutes=5)
+    async def save_state(self):
+        state.save(self.snapshot_state())
+
+    async def fetch_owners(self) -> None:
+        for owner_id in self.owner_ids:
+            if owner_id not in self._owners:
+                self._owners[owner_id] = await self.get_destination("user", owner_id)
 
     @property
     def uptime(self):
@@ -228,6 +637,13 @@ class AutoCord(commands.Bot):
         print("Username:", self.user.name)
         print("ID:", self.user.id)
         print("------------")
+        await self.fetch_owners()
+        rss = psutil.Process().memory_info().rss
+        log.info(f"Discord client is ready using {humanize.naturalsize(rss, binary=True)} (lean mode: {self.lean})")
+        self.outbox.wakeup()
+
+    async def on_resumed(self):
+        self.outbox.wakeup()
 
     def setup_logging(self):
         log_level = logging.DEBUG
@@ -264,12 +680,13 @@ class AutoCord(commands.Bot):
         self.load_extension("jishaku")
 
         self.launch_time = datetime.utcnow()
-        self.loop.create_task(
-            self.client.start(
-                username=sensitives.username,
-                password=sensitives.password,
-                shared_secret=sensitives.shared_secret,
-            )
+        self.outbox.start()
+        self.watch_preferences.start()
+        self.save_state.start()
+        if self.dashboard is not None:
+            await self.dashboard.start()
+        self.supervisor.start(
+            username=sensitives.username, password=sensitives.password, shared_secret=sensitives.shared_secret,
         )
         await super().start(sensitives.token)
 
@@ -278,6 +695,17 @@ class AutoCord(commands.Bot):
 
     async def close(self):
         log.debug("Shutting down")
+        self.watch_preferences.cancel()
+        self.save_state.cancel()
+        self.supervisor.cancel()
+        state.save(self.snapshot_state())
+        try:  # before the outbox so nothing is relayed once it's closed
+            await self.client.close()
+        except Exception as exc:  # logging out needs a connection to Steam
+            log.debug("Couldn't close the Steam client cleanly", exc_info=exc)
         await self.session.close()
-        await self.client.close()
+        await self.outbox.close()
+        if self.dashboard is not None:
+            await self.dashboard.close()
+        self.client.profits.checkpoint()
         await super().close()
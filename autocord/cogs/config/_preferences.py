@@ -16,3 +16,23 @@ channel_id = None
 owner_ids = [340869611903909888,]
 # whether or not to show your status as playing TF2
 play_tf2 = False
+# whether to only cache what the bot needs (its owners, one channel and the last 100 messages) to save memory
+lean_mode = False
+# whether to post a summary of the previous day's trades and profit every day
+profit_digest = True
+# rules for the messages relayed from your bots, each one is a dict with an "action" of
+#   "mute" to stop relaying them, "route" to send them to "channel_id" instead or "alert" to ping you
+# and optionally "keywords" and/or a regex "pattern" to look for, if it has neither it applies to every message
+# and "kinds" of "trade", "review" and/or "message" to only apply to them, eg.
+#   {"action": "alert", "keywords": ["Burning Flames", "Sunbeams"], "kinds": ["trade"]},
+#   {"action": "route", "channel_id": 123456789012345678, "kinds": ["review"]},
+relay_rules = []
+# the port to serve a live dashboard of what's being relayed on at http://127.0.0.1:<port>, None to turn it off
+dashboard_port = None
+# the fraction of relayed messages to trace, from 0 for none to 1 for every one, see the traces command
+trace_sample_rate = 0.1
+# whether to relay trades on the account autocord is logged into from Steam's own trade offer events instead of
+# the bot's chat messages, these come with the partner and items so they're faster, other bots still use chat
+native_trades = False
+# log any command that takes longer than this many seconds along with what it was given, None to turn it off
+slow_command_threshold = 5
@@ -81,7 +81,21 @@ class Discord(commands.Cog):
     @commands.command()
     async def uptime(self, ctx):
         """See how long the bot has been online for"""
-        await ctx.send(f"{self.bot.user.mention} has been online for {self.bot.uptime}")
+        message = f"{self.bot.user.mention} has been online for {self.bot.uptime}"
+        if self.bot.first_trade_after is not None:
+            start = "warm" if self.bot.warm else "cold"
+            message = f"{message}, the first trade was relayed {self.bot.first_trade_after:.2f}s after a {start} start"
+        supervisor = self.bot.supervisor
+        message = f"{message}\nThe Steam client has been connected {supervisor.availability:.2%} of the time"
+        if supervisor.reconnects:
+            average = sum(supervisor.reconnects) / len(supervisor.reconnects)
+            message = (
+                f"{message}, its last {len(supervisor.reconnects)} reconnects took {average:.2f}s on average"
+                f" (longest {max(supervisor.reconnects):.2f}s)"
+            )
+        if supervisor.fatal is not None:
+            message = f"{message}\nIt stopped trying to log in after: {supervisor.fatal}"
+        await ctx.send(message)
 
     @commands.command()
     @commands.is_owner()
@@ -106,6 +120,54 @@ class Discord(commands.Cog):
                 " can't spam me"
             )
 
+    @commands.group(invoke_without_command=True)
+    @commands.is_owner()
+    async def outbox(self, ctx: Context):
+        """See how many relayed messages are waiting to be delivered and how many have been given up on
+
+        **Examples**
+        - Look at the messages that couldn't be delivered.
+        `{prefix}outbox dead`
+        - Try to deliver them again.
+        `{prefix}outbox retry`"""
+        if ctx.invoked_subcommand is None:
+            dead = self.bot.outbox.dead_letters()
+            lanes = ", ".join(
+                f"{len(lane)} {priority.name.lower()}" for priority, lane in self.bot.outbox.lanes.items() if lane
+            )
+            await ctx.send(
+                f"There are {len(self.bot.outbox)} messages waiting to be delivered{f' ({lanes})' if lanes else ''}"
+                f" and {len(dead)} dead letters"
+            )
+
+    @outbox.command(name="dead")
+    async def o_dead(self, ctx: Context):
+        """Show the messages that failed to be delivered too many times"""
+        dead = self.bot.outbox.dead_letters()
+        if not dead:
+            return await ctx.send("There are no dead letters")
+        embed = discord.Embed(title=f"{len(dead)} dead letters", colour=discord.Colour.red())
+        for entry in dead[-10:]:
+            kind, id = entry["destination"]
+            preview = entry["content"] or (entry["embed"] or {}).get("description") or "..."
+            embed.add_field(
+                name=f"To {kind} {id} after {entry['attempts']} attempts",
+                value=f"{preview[:200]}\n`{entry['error'][:200]}`",
+                inline=False,
+            )
+        await ctx.send(embed=embed)
+
+    @outbox.command(name="retry")
+    async def o_retry(self, ctx: Context):
+        """Put the dead letters back in the outbox"""
+        await ctx.send(f"Retrying {self.bot.outbox.retry_dead_letters()} dead letters")
+
+    @outbox.command(name="clear")
+    async def o_clear(self, ctx: Context):
+        """Throw away the dead letters"""
+        self.bot.outbox.clear_dead_letters()
+        await ctx.send("Cleared the dead letters")
+
     @commands.command()
     async def ping(self, ctx: Context):
         """Check if your bot is online on both Steam and Discord"""
@@ -15,6 +15,10 @@ class HelpCommand(commands.HelpCommand):  # https://gist.github.com/Rapptz/31a34
     def get_ending_note(self):
         return "Use {0}{1} [command] for more info on a command.".format(self.clean_prefix, self.invoked_with)
 
+    def get_destination(self):
+        # send through the context so help goes through the same scheduler as other command replies
+        return self.context
+
     def get_command_signature(self, command):
         return "{0.qualified_name} {0.signature}".format(command)
 
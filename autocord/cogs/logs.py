@@ -0,0 +1,93 @@
+import io
+import re
+from datetime import datetime
+from itertools import islice
+from typing import TYPE_CHECKING, List, Optional, Tuple
+
+import discord
+import steam
+from discord.ext import commands, menus
+
+from .utils.context import Context
+from .utils.converters import Since
+from .utils.logs import search
+
+if TYPE_CHECKING:
+    from .. import AutoCord
+
+MAX_MATCHES = 10_000  # anything past this is almost certainly too broad a pattern
+MAX_PAGES = 10
+
+
+class LogSource(menus.ListPageSource):
+    def __init__(self, entries: List[Tuple[str, str]], pattern: str):
+        super().__init__(entries, per_page=10)
+        self.pattern = pattern
+
+    async def format_page(self, menu: menus.MenuPages, entries: List[Tuple[str, str]]):
+        lines = "\n".join(line[:180] for _, line in entries).replace("```", "`\u200b``")
+        embed = discord.Embed(
+            title=f'Log lines matching "{self.pattern}"', description=f"```\n{lines}```", colour=menu.ctx.bot.colour,
+        )
+        embed.set_footer(text=f"Page {menu.current_page + 1}/{self.get_max_pages()} • {entries[0][0]}")
+        return embed
+
+
+class Logs(commands.Cog):
+    """Commands for digging through the bot's logs"""
+
+    def __init__(self, bot: "AutoCord"):
+        self.bot = bot
+
+    @commands.group(invoke_without_command=True)
+    @commands.is_owner()
+    async def logs(self, ctx: Context):
+        """Logs is used to look through the log files the bot has written.
+
+        **Examples**
+        - Every line mentioning a trade.
+        `{prefix}logs search "Trade #\\d+"`
+        - Only look at the last 3 days.
+        `{prefix}logs search declined 3d`
+        """
+        if ctx.invoked_subcommand is None:
+            await ctx.send_help(ctx.command)
+
+    @logs.command(name="search")
+    async def l_search(self, ctx: Context, pattern: str, since: Since = None):
+        """Search the logs for a regex pattern, optionally only since a time like `3d` or a date like `01-08-2020`"""
+        try:
+            compiled = re.compile(pattern.encode(), re.IGNORECASE)
+        except re.error as exc:
+            return await ctx.send(f"`{pattern}` isn't a valid pattern: {exc}")
+
+        async with ctx.typing():
+            matches = await steam.utils.to_thread(self.collect, compiled, since)
+
+        if not matches:
+            return await ctx.send(f"No log lines matched `{pattern}`")
+        if len(matches) <= MAX_PAGES * 10:
+            pages = menus.MenuPages(source=LogSource(matches, pattern), clear_reactions_after=True)
+            return await pages.start(ctx)
+
+        buffer = io.BytesIO()
+        current: Optional[str] = None
+        for file_name, line in matches:
+            if file_name != current:
+                buffer.write(f"==> {file_name} <==\n".encode())
+                current = file_name
+            buffer.write(f"{line}\n".encode())
+        buffer.seek(0)
+        capped = " (capped)" if len(matches) == MAX_MATCHES else ""
+        await ctx.send(
+            f"Found {len(matches)}{capped} log lines matching `{pattern}`",
+            file=discord.File(buffer, filename=f"logs-{datetime.now():%d-%m-%Y}.txt"),
+        )
+
+    @staticmethod
+    def collect(pattern: "re.Pattern[bytes]", since: Optional[datetime]) -> List[Tuple[str, str]]:
+        return list(islice(search(pattern, since), MAX_MATCHES))
+
+
+def setup(bot):
+    bot.add_cog(Logs(bot))
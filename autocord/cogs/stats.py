@@ -0,0 +1,275 @@
+import asyncio
+import io
+import threading
+import tracemalloc
+from datetime import datetime
+from collections import deque
+from typing import TYPE_CHECKING, Deque, List, Optional, Tuple
+
+import discord
+import humanize
+import psutil
+import steam
+from discord.ext import commands, tasks
+
+from .utils.context import Context
+from .utils.profiler import Sampler
+
+if TYPE_CHECKING:
+    from .. import AutoCord
+
+LAG_PROBE = 0.1  # how long the lag probe asks to sleep for
+TRACE_FRAMES = 10
+
+
+def format_size(size: int) -> str:
+    return humanize.naturalsize(size, binary=True)
+
+
+def format_top(top: List[Tuple[str, int]], samples: int) -> str:
+    lines = [f"`{count / samples:6.1%}` {name}" for name, count in top]
+    return "\n".join(lines)[:1024] or "Nothing was sampled"
+
+
+class Stats(commands.Cog):
+    """Commands to see what resources the bot is using"""
+
+    def __init__(self, bot: "AutoCord"):
+        self.bot = bot
+        self.process = psutil.Process()
+        self.process.cpu_percent()  # the first call always returns 0
+        self.lag: Deque[float] = deque(maxlen=60)
+        self.sampler: Optional[Sampler] = None
+        self.measure_lag.start()
+
+    def cog_unload(self):
+        self.measure_lag.cancel()
+        if self.sampler is not None:
+            self.sampler.finished.set()
+
+    @tasks.loop(seconds=5)
+    async def measure_lag(self):
+        start = self.bot.loop.time()
+        await asyncio.sleep(LAG_PROBE)
+        self.lag.append(max(self.bot.loop.time() - start - LAG_PROBE, 0))
+
+    @commands.group(invoke_without_command=True)
+    @commands.is_owner()
+    async def stats(self, ctx: Context):
+        """See how much CPU and memory the bot is using, along with how big its caches are
+
+        **Examples**
+        - Find out what has allocated the most memory over a minute.
+        `{prefix}stats memory 60`"""
+        if ctx.invoked_subcommand is not None:
+            return
+        with self.process.oneshot():
+            cpu = self.process.cpu_percent()
+            memory = self.process.memory_info()
+            fds = self.process.num_fds() if psutil.POSIX else self.process.num_handles()
+            threads = self.process.num_threads()
+
+        embed = discord.Embed(title="Resource usage", colour=self.bot.colour)
+        embed.add_field(name=f"{ctx.emoji.cpu} CPU", value=f"`{cpu:.1f}%` over {threads} threads")
+        embed.add_field(name=f"{ctx.emoji.ram} Memory", value=f"`{format_size(memory.rss)}` RSS")
+        embed.add_field(name="Open files", value=f"`{fds}` {'descriptors' if psutil.POSIX else 'handles'}")
+        embed.add_field(name="Tasks", value=f"`{len(asyncio.all_tasks())}` asyncio tasks")
+        if self.lag:
+            embed.add_field(
+                name="Loop lag",
+                value=f"`{self.lag[-1] * 1000:.2f}` ms now, `{max(self.lag) * 1000:.2f}` ms max over 5 minutes",
+            )
+        client = self.bot.client
+        embed.add_field(
+            name="Caches",
+            value=(
+                f"{len(self.bot.guilds)} guilds, {len(self.bot.users)} users,"
+                f" {len(self.bot.cached_messages)} messages on Discord\n"
+                f"{len(client.users)} users on Steam, {len(client.profiles)} trader profiles\n"
+                f"{len(client.trade_messages)} tracked trades,"
+                f" {len(client.inventories.histories)} inventory histories,"
+                f" {len(self.bot.outbox)} messages in the outbox"
+            ),
+            inline=False,
+        )
+        if tracemalloc.is_tracing():
+            current, peak = tracemalloc.get_traced_memory()
+            embed.set_footer(text=f"tracemalloc is tracing {format_size(current)} (peak {format_size(peak)})")
+        await ctx.send(embed=embed)
+
+    @stats.command(name="memory")
+    async def s_memory(self, ctx: Context, seconds: int = 60, top: int = 10):
+        """Trace memory allocations for a while and show which lines allocated the most
+
+        This slows the bot down while it's running, so it's only on when you ask for it."""
+        if not 1 <= seconds <= 60 * 60:
+            return await ctx.send("seconds needs to be between 1 and 3600")
+        top = min(max(top, 1), 25)
+        if tracemalloc.is_tracing():
+            return await ctx.send("Memory is already being traced")
+
+        tracemalloc.start(TRACE_FRAMES)
+        try:
+            await ctx.send(f"Tracing memory allocations for {humanize.naturaldelta(seconds)} {ctx.emoji.loading}")
+            before = tracemalloc.take_snapshot()
+            await asyncio.sleep(seconds)
+            after = tracemalloc.take_snapshot()
+        finally:
+            tracemalloc.stop()
+
+        filters = (tracemalloc.Filter(False, tracemalloc.__file__),)
+        stats = await steam.utils.to_thread(
+            after.filter_traces(filters).compare_to, before.filter_traces(filters), "lineno"
+        )
+        growth = [stat for stat in stats if stat.size_diff > 0][:top]
+        if not growth:
+            return await ctx.send("Nothing allocated any more memory")
+
+        lines = []
+        for stat in growth:
+            frame = stat.traceback[0]
+            lines.append(
+                f"`{frame.filename.rsplit('site-packages', 1)[-1]}:{frame.lineno}` "
+                f"+{format_size(stat.size_diff)} ({stat.count_diff:+} blocks)"
+            )
+        embed = discord.Embed(
+            title=f"Top {len(growth)} allocation sites by growth over {humanize.naturaldelta(seconds)}",
+            description="\n".join(lines),
+            colour=self.bot.colour,
+        )
+        embed.set_footer(text=f"Net change {sum(stat.size_diff for stat in stats):+,} bytes")
+        await ctx.send(embed=embed)
+
+    @commands.command()
+    @commands.is_owner()
+    async def profile(self, ctx: Context, seconds: int = 10, top: int = 10):
+        """Sample what every thread is doing for a while to find out where the bot is spending its time
+
+        This uploads the collapsed stacks, which can be opened with speedscope.app or turned into a
+        flamegraph with flamegraph.pl, and shows the functions that were seen the most.
+
+        **Examples**
+        - Profile the bot for 30 seconds.
+        `{prefix}profile 30`"""
+        if not 1 <= seconds <= 5 * 60:
+            return await ctx.send("seconds needs to be between 1 and 300")
+        if self.sampler is not None:
+            return await ctx.send("The bot is already being profiled")
+        top = min(max(top, 1), 25)
+
+        self.sampler = sampler = Sampler(loop_thread=threading.get_ident())
+        sampler.start()
+        try:
+            await ctx.send(f"Profiling for {humanize.naturaldelta(seconds)} {ctx.emoji.loading}")
+            await asyncio.sleep(seconds)
+        finally:
+            sampler.finished.set()
+            await steam.utils.to_thread(sampler.join)
+            self.sampler = None
+
+        if not sampler.samples:
+            return await ctx.send("No samples were taken")
+        own, total = sampler.top(top)
+        embed = discord.Embed(
+            title=f"Profiled {sampler.samples} samples over {sampler.elapsed:.1f}s", colour=self.bot.colour,
+        )
+        embed.add_field(name="Own time", value=format_top(own, sampler.samples), inline=False)
+        embed.add_field(name="Total time", value=format_top(total, sampler.samples), inline=False)
+        embed.set_footer(
+            text="Percentages are of the samples of each function's thread, waiting for work still counts as a sample"
+        )
+        file = discord.File(
+            io.BytesIO(sampler.collapsed().encode()), filename=f"profile-{datetime.now():%d-%m-%Y-%H%M%S}.txt"
+        )
+        await ctx.send(embed=embed, file=file)
+
+    @commands.group(invoke_without_command=True)
+    @commands.is_owner()
+    async def traces(self, ctx: Context, count: int = 10):
+        """See the slowest recently traced messages and where their time went
+
+        **Examples**
+        - The 5 slowest traces.
+        `{prefix}traces 5`
+        - Every span of one trace.
+        `{prefix}traces show 1a2b3c4d`"""
+        if ctx.invoked_subcommand is not None:
+            return
+        tracer = self.bot.tracer
+        slowest = tracer.slowest(min(max(count, 1), 25))
+        if not slowest:
+            return await ctx.send(f"Nothing has been traced yet, {tracer.rate:.0%} of messages are traced")
+        embed = discord.Embed(
+            title=f"The {len(slowest)} slowest of the last {len(tracer.recent)} traces", colour=self.bot.colour
+        )
+        for trace in slowest:
+            spans = {}
+            for span in trace.spans:
+                spans[span["name"]] = spans.get(span["name"], 0) + span["duration"]
+            breakdown = ", ".join(f"{name} {duration:.0f}ms" for name, duration in spans.items())
+            embed.add_field(
+                name=f"{trace.name} `{trace.id}` {trace.duration:.0f}ms",
+                value=f"steam {trace.attrs.get('steam_delay', 0):.0f}ms, {breakdown}"[:1024],
+                inline=False,
+            )
+        embed.set_footer(text=f"{tracer.rate:.0%} of messages are traced, every trace is in {tracer.path}")
+        await ctx.send(embed=embed)
+
+    @traces.command(name="show")
+    async def t_show(self, ctx: Context, id: str):
+        """Show every span of a trace"""
+        trace = self.bot.tracer.get(id)
+        if trace is None:
+            return await ctx.send(f"There's no recent trace with the id `{id}`")
+        lines = [f"{'start':>9} {'took':>9}  span"]
+        for span in sorted(trace.spans, key=lambda span: span["start"]):
+            extra = " ".join(
+                f"{key}={value}" for key, value in span.items() if key not in ("name", "start", "duration")
+            )
+            lines.append(f"{span['start']:>7.1f}ms {span['duration']:>7.1f}ms  {span['name']} {extra}")
+        await ctx.send(
+            f"**{trace.name}** `{trace.id}` took {trace.duration:.1f}ms after waiting"
+            f" {trace.attrs.get('steam_delay', 0):.0f}ms on Steam\n```\n" + "\n".join(lines)[:1800] + "```"
+        )
+
+    @commands.command(aliases=["command_stats"])
+    @commands.is_owner()
+    async def commandstats(self, ctx: Context, *, command: str = None):
+        """See how long commands have been taking and how much of that was spent waiting on Steam and Discord
+
+        Time spent waiting for someone to reply to a command isn't counted.
+
+        **Examples**
+        - Every command that's been used, slowest first.
+        `{prefix}commandstats`
+        - Just one command.
+        `{prefix}commandstats stats memory`"""
+        telemetry = self.bot.telemetry
+        names = telemetry.slowest()
+        if command is not None:
+            names = [name for name in names if name == command]
+        if not names:
+            return await ctx.send(f"`{command}` hasn't been used yet" if command else "No commands have been used yet")
+
+        lines = [f"{'command':<20} {'uses':>5} {'p50':>7} {'p95':>7} {'p99':>7} {'steam':>6} {'discord':>7}"]
+        for name in names:
+            summary = telemetry.summary(name)
+            failed = f" ({summary.failed} failed)" if summary.failed else ""
+            lines.append(
+                f"{name[:20]:<20} {summary.count:>5} {summary.p50:>6.2f}s {summary.p95:>6.2f}s {summary.p99:>6.2f}s"
+                f" {summary.steam:>6.0%} {summary.discord:>7.0%}{failed}"
+            )
+        if telemetry.slow_after is None:
+            threshold = "slow commands aren't logged"
+        else:
+            threshold = f"commands over {telemetry.slow_after}s are logged"
+        await ctx.send(
+            f"Timings of the last {telemetry.size} uses of each command, not counting time waiting for replies,"
+            f" {threshold}\n```\n"
+            + "\n".join(lines)[:1850]
+            + "```"
+        )
+
+
+def setup(bot):
+    bot.add_cog(Stats(bot))
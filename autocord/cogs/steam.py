@@ -1,11 +1,28 @@
 import asyncio
+import csv
+import io
+from datetime import datetime
+from typing import Optional
 
 import discord
+import steam
 from discord.ext import commands
 
 from .utils.context import Context
 from .utils.formats import human_join
-from .utils.choice import wait_for_bool, wait_for_options, wait_for_any, wait_for_digit
+from .utils.choice import wait_for_bool
+from .utils.converters import Since, SteamBot
+from .utils.listings import (
+    ACTIONS,
+    ListingError,
+    compile_rows,
+    diff_listings,
+    parse_csv,
+    parse_line,
+    parse_row,
+    read_pricelist,
+)
+from .utils.telemetry import waiting
 
 
 class Steam(commands.Cog):
@@ -15,20 +32,27 @@ class Steam(commands.Cog):
         self.bot = bot
 
     @staticmethod
-    async def update_classifieds(ctx, items):
+    async def update_classifieds(ctx, items, steam_bot: Optional[steam.User] = None):
+        steam_bot = steam_bot or ctx.steam_bot
         is_list = isinstance(items, list)
         this = "these" if is_list else "this"
         command = "commands" if is_list else "command"
-        pretty_name = human_join(items, delimiter="`, `", final="` and `")
-        await ctx.send(f"Do you want to send {this} `{pretty_name}` {command} to the bot?")
+        if is_list and len(items) > 10:
+            file = discord.File(io.BytesIO("\n".join(items).encode()), filename="commands.txt")
+            await ctx.send(f"Do you want to send {this} {len(items)} {command} to the bot?", file=file)
+        else:
+            pretty_name = human_join(items, delimiter="`, `", final="` and `") if is_list else items
+            await ctx.send(f"Do you want to send {this} `{pretty_name}` {command} to the bot?")
         if await wait_for_bool(ctx):
             async with ctx.typing():
                 if is_list:
                     for item in items:
-                        await ctx.steam_bot.send(item)
+                        with waiting("steam"):
+                            await steam_bot.send(item)
                         await asyncio.sleep(3)
                 else:
-                    await ctx.steam_bot.send(items)
+                    with waiting("steam"):
+                        await steam_bot.send(items)
             await ctx.send(f'Sent{f" {len(items)}" if is_list else ""} {command} to the bot')
         else:
             await ctx.send("The command hasn't been sent")
@@ -106,9 +130,64 @@ class Steam(commands.Cog):
     @remove.command(name="items")
     async def r_items(self, ctx, *, items):
         """Handles multiple removals"""
-        items = [f"!add name={item.strip()}" for item in items.split(",")]
+        items = [f"!remove name={item.strip()}" for item in items.split(",")]
         await self.update_classifieds(ctx, items)
 
+    @commands.command()
+    @commands.is_owner()
+    async def sync(self, ctx: "Context", steam_bot: SteamBot = None):
+        """Sync makes your bot's classifieds match a CSV file of every item you want listed.
+        It's compared to the pricelist in the bot's files folder so only the items that need adding,
+        updating or removing are sent. The file has the same columns as `{prefix}scc`.
+
+        **Examples**
+        - Sync your first bot, attach the CSV file.
+        `{prefix}sync`
+        - Sync a different bot.
+        `{prefix}sync 76561198400794682`"""
+        if not ctx.message.attachments:
+            return await ctx.send("Attach a CSV file of the items you want listed")
+        if steam_bot is None:
+            if not ctx.steam_bots:
+                return await ctx.send("You aren't logged in to Steam")
+            steam_bot = ctx.steam_bots[0]
+
+        try:
+            file = await ctx.message.attachments[0].read()
+            rows = parse_csv(file.decode())
+        except (UnicodeDecodeError, csv.Error) as exc:
+            return await ctx.send(f"I couldn't read that: {exc}")
+        desired = []
+        errors = []
+        for number, row in enumerate(rows, start=1):
+            try:
+                desired.append(parse_row("add", row, number))
+            except ListingError as exc:
+                errors.append(exc)
+        if errors:
+            shown = "\n".join(str(error) for error in errors[:10])
+            more = f"\n...and {len(errors) - 10} more" if len(errors) > 10 else ""
+            return await ctx.send(f"Nothing was sent as {len(errors)} rows aren't valid:\n```\n{shown}{more}```")
+
+        try:
+            folder = self.bot.preferences.bots_steam_ids[steam_bot.id64]
+        except KeyError:  # the preferences changed since the bots were fetched
+            return await ctx.send(f"{steam_bot} isn't in your bots_steam_ids anymore")
+        try:
+            current = await steam.utils.to_thread(read_pricelist, folder)
+        except (OSError, ValueError, KeyError) as exc:
+            return await ctx.send(f"I couldn't read {steam_bot}'s pricelist: {exc}")
+
+        adds, updates, removes = diff_listings(desired, current)
+        commands_ = adds + updates + removes
+        if not commands_:
+            return await ctx.send(f"{steam_bot}'s classifieds already match all {len(desired)} items")
+        await ctx.send(
+            f"{len(desired)} items compared to {len(current)} listed: {len(adds)} to add, {len(updates)} to update"
+            f" and {len(removes)} to remove"
+        )
+        await self.update_classifieds(ctx, commands_ if len(commands_) > 1 else commands_[0], steam_bot)
+
     @commands.command()
     @commands.is_owner()
     async def acknowledged(self, ctx):
@@ -116,11 +195,12 @@ class Steam(commands.Cog):
         This is so user messages don't get lost in the channel history"""
         self.bot.client.user_message.cancel()
         self.bot.client.first = True
-        for message in self.bot.messages:
+        for channel_id, message_id in self.bot.messages:
             try:
-                await message.unpin()
+                await self.bot.http.unpin_message(channel_id, message_id)
             except discord.HTTPException:
                 pass
+        self.bot.messages.clear()
         await ctx.send("Acknowledged the user's message")
 
     @commands.command()
@@ -129,12 +209,17 @@ class Steam(commands.Cog):
         """Send is used to send a message to the bot
         eg. `{prefix}send {prefix}message 76561198248053954 Get on steam`"""
         async with ctx.typing():
-            await ctx.steam_bot.send(message)
+            with waiting("steam"):
+                await ctx.steam_bot.send(message)
             await ctx.send(f"Sent `{message}` to the bot")
 
-    @commands.command(aliases=["bp"])
+    @commands.group(aliases=["bp"], invoke_without_command=True)
     async def backpack(self, ctx: "Context"):
-        """Get a link to your inventory and your bot's"""
+        """Get a link to your inventory and your bot's
+
+        **Examples**
+        - See what your bots have traded in the last day.
+        `{prefix}backpack diff 1d`"""
         bptf = "https://backpack.tf"
         embed = discord.Embed(
             title="Backpack.tf",
@@ -147,12 +232,89 @@ class Steam(commands.Cog):
         embed.set_thumbnail(url=f"{bptf}/images/tf-icon.png")
         await ctx.send(embed=embed)
 
+    @backpack.command(name="diff")
+    async def bp_diff(self, ctx: "Context", since: Since = None):
+        """See what came in to and went out of your bots' inventories since a time like `1d` or the last change"""
+        embed = discord.Embed(title="Inventory changes", color=0x58788F)
+        async with ctx.typing():
+            for bot in ctx.steam_bots:
+                history = self.bot.client.inventories[bot.id64]
+                with waiting("steam"):
+                    latest = await self.bot.client.inventories.refresh(bot)
+                if since is not None:
+                    previous = history.at(since.timestamp())
+                else:
+                    previous = history.snapshots[-2] if len(history.snapshots) > 1 else latest
+                if latest is None or previous is None:
+                    embed.add_field(name=str(bot), value="I haven't been able to get this inventory yet", inline=False)
+                    continue
+
+                came_in, went_out = previous.diff(latest)
+                lines = [f"+ {count}x {history.names[id]}" for id, count in came_in]
+                lines += [f"- {count}x {history.names[id]}" for id, count in went_out]
+                changes = "\n".join(lines[:25]) or "Nothing has changed"
+                if len(lines) > 25:
+                    changes = f"{changes}\n...and {len(lines) - 25} more"
+                embed.add_field(
+                    name=(
+                        f"{bot} ({latest.total} items, since"
+                        f" {datetime.fromtimestamp(previous.timestamp):%d-%m-%Y %H:%M})"
+                    ),
+                    value=f"```diff\n{changes[:1000]}```",
+                    inline=False,
+                )
+        await ctx.send(embed=embed)
+
+    @commands.group(invoke_without_command=True)
+    async def price(self, ctx: "Context"):
+        """Price is used to look at the prices your bots have traded items at.
+
+        **Examples**
+        - Every trade of an item.
+        `{prefix}price history The Team Captain`
+        - Only the last week's trades.
+        `{prefix}price history 7d The Team Captain`"""
+        if ctx.invoked_subcommand is None:
+            await ctx.send_help(ctx.command)
+
+    @price.command(name="history")
+    async def p_history(self, ctx: "Context", since: Optional[Since] = None, *, item: str):
+        """Show the spread of prices an item has been bought and sold at"""
+        prices = self.bot.client.prices
+        name = prices.search(item)
+        if name is None:
+            return await ctx.send(f"There aren't any trades of `{item}` with a price I could work out")
+
+        embed = discord.Embed(title=f"Price history of {name}", color=self.bot.colour)
+        timestamp = since.timestamp() if since is not None else None
+        for label, sold in (("Sold", True), ("Bought", False)):
+            stats = prices.stats(name, timestamp, sold=sold)
+            if stats is None:
+                continue
+            lines = []
+            for percentile, (keys, metal) in stats.prices.items():
+                worth = f" ({keys * stats.key_price + metal:.2f} ref)" if keys and stats.key_price is not None else ""
+                lines.append(f"**{percentile}:** {keys:g} keys, {metal:.2f} ref{worth}")
+            embed.add_field(name=f"{label} {stats.count} times", value="\n".join(lines))
+        if not embed.fields:
+            embed.description = "There aren't any trades in that time"
+        key_price = prices.key_price()
+        if key_price is not None:
+            footer = f"Keys are valued at {key_price:.2f} ref"
+        else:
+            footer = "There aren't any key trades to value keys with"
+        if since is not None:
+            footer = f"{footer} • Since {since:%d-%m-%Y %H:%M}"
+        embed.set_footer(text=footer)
+        await ctx.send(embed=embed)
+
     @commands.command(aliases=["raw_add", "add-raw", "raw-add"])
     @commands.is_owner()
     async def add_raw(self, ctx, *, ending=None):
         """Add lots of items, from both a .txt file or a discord message"""
         await ctx.send("Paste all the items you want to add on a new line, or attach a text file")
-        message = await self.bot.wait_for("message", check=lambda m: m.author == ctx.author)
+        with waiting("user"):
+            message = await self.bot.wait_for("message", check=lambda m: m.author == ctx.author)
         items = []
         if message.content:
             items.extend(message.content.splitlines())
@@ -162,199 +324,47 @@ class Steam(commands.Cog):
         else:
             return await ctx.send("Please send either a file or a message")
         for item in items:
-            await self.bot.steam_bot.send(f'!add name={item}{ending if ending else ""}')
+            with waiting("steam"):
+                await ctx.steam_bot.send(f'!add name={item}{ending if ending else ""}')
         await ctx.send(f"Done adding {len(items)} items")
 
     @commands.command()
     @commands.is_owner()
-    async def scc(self, ctx):
-        """SCC - Steam Command Creator is a ~~worse~~ better version of Hackerino's command generator tool"""
-        ngt1, ngt2, ngt3, ngt4, ngt5, ngt6, ngt7, ngt8, ngt9 = [True for _ in range(9)]
-        scclist = [
-            "__You can change the:__\n",
-            "Price",
-            "Limit",
-            "Quality",
-            "Intent",
-            "Craftable",
-            "Australium",
-            "Killstreak",
-            "Effect",
-            "Autopricing",
-            "\nIf you don't type want to change any type escape",
-        ]
-        intents = ["Bank", "Buy", "Sell"]
-        qualities = [
-            "Unique",
-            "Strange",
-            "Vintage",
-            "Genuine",
-            "Haunted",
-            "Collector's",
-        ]
-
-        await ctx.send("What do you want to do?\nUpdate, Remove or Add?")
-        choice = await wait_for_options(ctx, "update", "u", "add", "a", "remove", "r")
-        if choice in ("update", "u"):
-            do = "update"
-        elif choice in ("add", "a"):
-            do = "add"
-        else:
-            do = "remove"
-        await ctx.send(f"What item do you want to {do}?")
-        item = await wait_for_any(ctx)
-        command = item
-
-        if do == "remove":
-            f"!remove name={command}"
-        else:
-            await ctx.send("Do you want to add prefixes to the command?")
-            if await wait_for_bool(ctx):
-                await ctx.send("\n".join(scclist))
-                while 1:
-                    if True not in (ngt1, ngt2, ngt3, ngt4, ngt5, ngt6, ngt7, ngt8, ngt9,):
-                        break
-
-                    prefix = await wait_for_any(ctx)
-
-                    if prefix in ("price", "p") and ngt1:
-                        await ctx.send("Buy price in refined metal")
-                        buy_price_ref = await wait_for_digit(ctx)
-                        await ctx.send("Buy price in keys")
-                        buy_price_keys = await wait_for_digit(ctx)
-
-                        await ctx.send("Sell price in refined metal")
-                        sell_price_ref = await wait_for_digit(ctx)
-                        await ctx.send("Sell price in keys")
-                        sell_price_keys = await wait_for_digit(ctx)
-
-                        command = (
-                            f"{command}&buy.metal={buy_price_ref}&buy.keys={buy_price_keys}"
-                            f"&sell.metal={sell_price_ref}&sell.keys={sell_price_keys}"
-                        )
-                        scclist.remove("Price")
-                        formatted = "\n".join(scclist)
-                        ngt1 = False
-                        await ctx.send(f"Do you want to add more options to your command from the list:\n{formatted}")
-
-                    elif prefix in ("limit", "l") and ngt2:
-                        await ctx.send("Max stock is")
-                        limit = await wait_for_digit(ctx)
-                        command = f"{command}&limit={limit}"
-                        scclist.remove("Limit")
-                        formatted = "\n".join(scclist)
-                        ngt2 = False
-                        await ctx.send(f"Do you want to add more options to your command from the list:\n{formatted}")
-
-                    elif prefix in ("quality", "q") and ngt3:
-                        await ctx.send(f'Quality (enter {human_join(qualities, delimiter="/", final="or")})')
-                        quality = wait_for_options(ctx, qualities)
-                        command = f"{quality} {command}" if do == "update" else command = f"{command}&quality={quality}"
-
-                        scclist.remove("Quality")
-                        formatted = "\n".join(scclist)
-                        ngt3 = False
-                        await ctx.send(f"Do you want to add more options to your command from the list:\n{formatted}")
-
-                    elif prefix in ("intent", "i") and ngt4:
-                        await ctx.send(f'Intent is to ({human_join(intents, final="or")}')
-                        intent = await wait_for_options(ctx, *intents)
-                        command = f"{command}&intent={intent}"
-
-                        scclist.remove("Intent")
-                        formatted = "\n".join(scclist)
-                        ngt4 = False
-                        await ctx.send(f"Do you want to add more options to your command from the list:\n{formatted}")
-
-                    elif prefix in ("craftable", "c") and ngt5:
-                        await ctx.send("Is the item craftable?")
-                        if await wait_for_bool(ctx):
-                            command = f"Craftable {command}" if do == "update" else f"{command}&craftable=true"
-                        else:
-                            command = f"Non-Craftable {command}" if do == "update" else f"{command}&quality=false"
-
-                        scclist.remove("Craftable")
-                        formatted = "\n".join(scclist)
-                        ngt5 = False
-                        await ctx.send(f"Do you want to add more options to your command from the list:\n{formatted}")
-
-                    elif prefix in ("australium", "au") and ngt6:
-                        await ctx.send("Is the item australium?")
-                        if await wait_for_bool(ctx):
-                            command = f"Strange Australium {command}" if do == "update" else  f"{command}&strange=true&australium=true"
-
-                        scclist.remove("Australium")
-                        formatted = "\n".join(scclist)
-                        ngt6 = False
-                        await ctx.send(f"Do you want to add more options to your command from the list:\n{formatted}")
-
-                    elif prefix in ("killstreak", "k") and ngt7:
-                        await ctx.send("Is the item killstreak (Killstreak (1), Specialized (2) or Professional (3))")
-                        options = (
-                            "1",
-                            "k",
-                            "killstreak",
-                            "basic",
-                            "2",
-                            "s",
-                            "specialized",
-                            "3",
-                            "p",
-                            "professional",
-                        )
-                        killstreak = await wait_for_options(ctx, options)
-
-                        if killstreak in ("1", "k", "killstreak", "basic"):
-                            command = f"Killstreak {command}" if do == "update" else f"{command}&quality=1"
-                        elif killstreak in ("2", "s", "specialized"):
-                            command = f"Specialized {command}" if do == "update" else f"{command}&quality=2"
-                        elif killstreak in ("3", "p", "professional"):
-                            if do == "update":
-                                command = f"Professional {command}"
-                            else:
-                                command = f"{command}&quality=3"
-
-                        scclist.remove("Killstreak")
-                        formatted = "\n".join(scclist)
-                        ngt7 = False
-                        await ctx.send(f"Do you want to add more options to your command from the list:\n{formatted}")
-
-                    elif prefix in ("effect", "e") and ngt8:  # effect suffix
-                        await ctx.send("What is the unusual effect? E.g Burning Flames")
-                        effect = await wait_for_any(ctx, lower=False)
-                        command = f"{effect} {command}" if do == "update" else f"{command}&effect={effect}"
-                        scclist.remove("Effect")
-                        formatted = "\n".join(scclist)
-                        ngt8 = False
-                        await ctx.send(f"Do you want to add more options to your command from the list:\n{formatted}")
-
-                    elif prefix in ("autoprice", "ap") and ngt9:
-                        await ctx.send("Is auto-pricing enabled?")
-                        choice = await wait_for_bool(ctx)
-                        command = f"{command}&autoprice={choice}"
-                        scclist.remove("Autopricing")
-                        formatted = "\n".join(scclist)
-                        ngt9 = False
-                        await ctx.send(f"Do you want to add more options to your command from the list:\n{formatted}")
-
-                    elif prefix in ("escape", "esc"):
-                        break
-
-            if do == "update":
-                command = f"!update name={command}"
-            elif do == "add":
-                command = f"!add name={command}"
+    async def scc(self, ctx, action: str, *, listing: str = None):
+        """SCC - Steam Command Creator builds add, update or remove commands in one go.
+        Options are price (buy_keys, buy_metal, sell_keys, sell_metal), limit, quality, intent,
+        craftable, australium, killstreak, effect and autoprice.
 
-        await ctx.send(
-            f"Command to {do} {item} is `{command}`\nDo you want to send the command to the bot?\nType yes or no"
-        )
-
-        if await wait_for_bool(ctx):
-            async with ctx.typing():
-                await ctx.steam_bot.send(command)
-            await ctx.send(":ok_hand: sent")
-        else:
-            await ctx.send(":thumbsdown: you didn't send the command")
+        **Examples**
+        - One item.
+        `{prefix}scc add The Team Captain&sell_metal=30&limit=1&effect=Burning Flames`
+        - Lots of items, attach a CSV file with a name column and a column for each option you want to set.
+        `{prefix}scc update`
+        """
+        try:
+            action = ACTIONS[action.lower()]
+        except KeyError:
+            raise commands.BadArgument(f'"{action}" is not add, update or remove') from None
+
+        try:
+            if listing is not None:
+                rows = [parse_line(listing)]
+            elif ctx.message.attachments:
+                file = await ctx.message.attachments[0].read()
+                rows = parse_csv(file.decode())
+            else:
+                return await ctx.send_help(ctx.command)
+        except (ListingError, UnicodeDecodeError, csv.Error) as exc:
+            return await ctx.send(f"I couldn't read that: {exc}")
+
+        commands_, errors = compile_rows(action, rows)
+        if errors:
+            shown = "\n".join(str(error) for error in errors[:10])
+            more = f"\n...and {len(errors) - 10} more" if len(errors) > 10 else ""
+            return await ctx.send(f"Nothing was sent as {len(errors)} rows aren't valid:\n```\n{shown}{more}```")
+        if not commands_:
+            return await ctx.send("There weren't any items in that file")
+        await self.update_classifieds(ctx, commands_ if len(commands_) > 1 else commands_[0])
 
 
 def setup(bot):
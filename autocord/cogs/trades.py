@@ -0,0 +1,207 @@
+import asyncio
+import re
+from datetime import date, datetime, timedelta, timezone
+from typing import TYPE_CHECKING, Any, AsyncIterator, Dict, Iterable, List, Optional
+
+import discord
+from discord.ext import commands, tasks
+
+from .utils.context import Context
+from .utils.converters import Since
+from .utils.export import FORMATS, PartWriter
+from .utils.profit import Aggregate
+from .utils.trades import STATUS
+
+if TYPE_CHECKING:
+    from .. import AutoCord
+
+PERIODS = {"day": 1, "week": 7, "month": 30}
+CHUNK_SIZE = 500
+
+
+def net_value(aggregate: Aggregate, key_price: Optional[float]) -> str:
+    if key_price is None:
+        return ""
+    return f"{aggregate.net_keys * key_price + aggregate.net_metal:+.2f} ref"
+
+
+def format_aggregate(aggregate: Aggregate, key_price: Optional[float] = None) -> str:
+    lines = [
+        f"{aggregate.trades} trades",
+        f"Keys: +{aggregate.keys_in:g} / -{aggregate.keys_out:g} (**{aggregate.net_keys:+g}**)",
+        f"Metal: +{aggregate.metal_in:.2f} / -{aggregate.metal_out:.2f} (**{aggregate.net_metal:+.2f}**)",
+    ]
+    if key_price is not None:
+        lines.append(f"Net: **{net_value(aggregate, key_price)}**")
+    return "\n".join(lines)
+
+
+class Trades(commands.Cog):
+    """Commands about the trades your bots have made"""
+
+    def __init__(self, bot: "AutoCord"):
+        self.bot = bot
+        self.checkpoint.start()
+        self.digest.start()
+
+    def cog_unload(self):
+        self.checkpoint.cancel()
+        self.digest.cancel()
+        self.bot.client.profits.checkpoint()
+
+    def profit_embed(self, title: str, days: Iterable[int]) -> discord.Embed:
+        days = list(days)
+        profits = self.bot.client.profits
+        key_price = self.bot.client.prices.key_price()
+        embed = discord.Embed(title=title, color=self.bot.colour)
+        total = Aggregate()
+        for id64, aggregate in profits.by_bot(days).items():
+            total += aggregate
+            bot = self.bot.client.get_user(id64)
+            embed.add_field(name=str(bot or id64), value=format_aggregate(aggregate, key_price))
+        if not embed.fields:
+            embed.description = "There weren't any trades"
+            return embed
+
+        if len(embed.fields) > 1:
+            embed.add_field(name="All bots", value=format_aggregate(total, key_price))
+        traders = sorted(profits.by_trader(days).items(), key=lambda item: item[1].trades, reverse=True)[:5]
+        embed.add_field(
+            name="Top traders",
+            value="\n".join(
+                f"[{id64}](https://steamcommunity.com/profiles/{id64}): {aggregate.trades} trades, "
+                f"{aggregate.net_keys:+g} keys, {aggregate.net_metal:+.2f} ref"
+                + (f" ({net_value(aggregate, key_price)})" if key_price is not None else "")
+                for id64, aggregate in traders
+            ),
+            inline=False,
+        )
+        first = date.fromordinal(days[0])
+        if key_price is not None:
+            embed.set_footer(text=f"Since {first:%d-%m-%Y} • Keys are valued at {key_price:.2f} ref")
+        else:
+            embed.set_footer(text=f"Since {first:%d-%m-%Y} • There aren't any key trades to value keys with")
+        return embed
+
+    @commands.command()
+    @commands.is_owner()
+    async def profit(self, ctx: Context, period: str = "day"):
+        """See how many trades your bots made and how much they made in the last day, week or month"""
+        try:
+            days = PERIODS[period.lower()]
+        except KeyError:
+            raise commands.BadArgument(f'"{period}" is not day, week or month') from None
+        embed = self.profit_embed(f"Profit over the last {period.lower()}", self.bot.client.profits.days(days))
+        await ctx.send(embed=embed)
+
+    @commands.group(invoke_without_command=True)
+    @commands.is_owner()
+    async def export(self, ctx: Context):
+        """Export is used to download the history of things the bot has relayed.
+
+        **Examples**
+        - Every trade as a CSV file.
+        `{prefix}export trades`
+        - The trades from the last 30 days as JSON lines.
+        `{prefix}export trades 30d jsonl`
+        - The trades between two dates.
+        `{prefix}export trades 01-01-2020 01-07-2020 csv`"""
+        if ctx.invoked_subcommand is None:
+            await ctx.send_help(ctx.command)
+
+    @export.command(name="trades")
+    async def e_trades(
+        self, ctx: Context, start: Optional[Since] = None, end: Optional[Since] = None, format: str = "csv",
+    ):
+        """Export your bots' trades as a compressed CSV or JSONL file, split into parts if it's too big to upload"""
+        format = format.lower()
+        if format not in FORMATS:
+            raise commands.BadArgument(f'"{format}" is not csv or jsonl')
+
+        writer = PartWriter(f"trades-{datetime.now():%d-%m-%Y}", format)
+        rows = 0
+        async with ctx.typing():
+            async for chunk in self.trade_records(start, end):
+                rows += len(chunk)
+                part = writer.write(chunk)
+                if part is not None:
+                    await self.upload(ctx, *part)
+            part = writer.finish()
+            if part is not None:
+                await self.upload(ctx, *part)
+        await ctx.send(f"Exported {rows} trades in {writer.parts} {'part' if writer.parts == 1 else 'parts'}")
+
+    @staticmethod
+    async def upload(ctx: Context, file, filename: str) -> None:
+        with file:
+            await ctx.send(file=discord.File(file, filename=filename))
+
+    async def trade_records(
+        self, start: Optional[datetime], end: Optional[datetime]
+    ) -> AsyncIterator[List[Dict[str, Any]]]:
+        """Chunks of trades from the local trade log, or from the trade channel if there isn't one yet."""
+        trade_log = self.bot.client.trade_log
+        chunk = []
+        if trade_log:
+            records = trade_log.read(
+                start.timestamp() if start is not None else None, end.timestamp() if end is not None else None
+            )
+            for record in records:
+                chunk.append(record)
+                if len(chunk) == CHUNK_SIZE:
+                    yield chunk
+                    chunk = []
+                    await asyncio.sleep(0)  # let everything else have a go
+        else:
+            channel = self.bot.channels[0]
+            # discord.py wants naive utc datetimes and Since gives local ones
+            after = datetime.utcfromtimestamp(start.timestamp()) if start is not None else None
+            before = datetime.utcfromtimestamp(end.timestamp()) if end is not None else None
+            async for message in channel.history(limit=None, after=after, before=before, oldest_first=True):
+                if message.author != self.bot.user or not message.embeds:
+                    continue
+                embed = message.embeds[0]
+                trade_id = re.match(r"Trade #(\d+)", embed.footer.text or "")
+                if trade_id is None:
+                    continue
+                description = embed.description or ""
+                status = STATUS.search(description)
+                _, _, summary = description.partition("Summary:")
+                chunk.append(
+                    {
+                        "timestamp": message.created_at.replace(tzinfo=timezone.utc).timestamp(),
+                        "trade_id": int(trade_id.group(1)),
+                        "bot": None,
+                        "trader": None,
+                        "status": status.group(1) if status is not None else None,
+                        "summary": " ".join(summary.replace("*", "").replace("_", "").split()),
+                    }
+                )
+                if len(chunk) == CHUNK_SIZE:
+                    yield chunk
+                    chunk = []
+        if chunk:
+            yield chunk
+
+    @tasks.loop(minutes=5)
+    async def checkpoint(self):
+        self.bot.client.profits.checkpoint()
+
+    @tasks.loop(hours=24)
+    async def digest(self):
+        if not getattr(self.bot.preferences, "profit_digest", True):
+            return
+        yesterday = date.today() - timedelta(days=1)
+        embed = self.profit_embed(f"Trades on {yesterday:%d-%m-%Y}", [yesterday.toordinal()])
+        await self.bot.client.send(embed=embed)
+
+    @digest.before_loop
+    async def before_digest(self):
+        await self.bot.wait_until_ready()
+        now = datetime.now()
+        midnight = datetime.combine(now.date() + timedelta(days=1), datetime.min.time())
+        await asyncio.sleep((midnight - now).total_seconds())
+
+
+def setup(bot):
+    bot.add_cog(Trades(bot))
@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+
+import asyncio
+import hashlib
+from collections import deque
+from datetime import datetime, timezone
+from typing import Any, Deque, Dict, List, NamedTuple, Optional, Set, Union
+
+import steam
+from steam.protobufs import UMS, EMsg
+from steam.protobufs.steammessages_friendmessages import (
+    CFriendMessagesGetRecentMessagesRequest,
+    CFriendMessagesGetRecentMessagesResponse,
+)
+
+HISTORY_LIMIT = 50  # messages to look back through per bot
+SLOP = 60  # seconds to look back past the last relayed message in case the clocks disagree
+MAX_AGE = 24 * 60 * 60  # don't relay anything older than this however long we were gone
+TIMEOUT = 10
+
+# steamio 0.3 ships the protobufs for reading a chat's history but doesn't register them as a unified message
+UMS.setdefault("FriendMessages.GetRecentMessages#1_Request", CFriendMessagesGetRecentMessagesRequest)
+UMS.setdefault("FriendMessages.GetRecentMessages#1_Response", CFriendMessagesGetRecentMessagesResponse)
+
+
+class HistoryMessage(NamedTuple):
+    """A message read back from a chat's history with as much of a :class:`steam.Message` as relaying needs."""
+
+    author: steam.User
+    content: str
+    created_at: datetime  # naive and in UTC like steamio's
+
+
+def timestamp(message: Union[steam.Message, HistoryMessage]) -> float:
+    return message.created_at.replace(tzinfo=timezone.utc).timestamp()
+
+
+async def recent_messages(client: steam.Client, user: steam.User, after: datetime) -> List[HistoryMessage]:
+    """The last :data:`HISTORY_LIMIT` messages ``user`` sent us since ``after``, oldest first.
+
+    steamio 0.3 can't read a chat's history so this asks Steam's FriendMessages service for it directly, the same
+    way steamio sends a message.
+    """
+    job_id = await client.ws.send_um(
+        "FriendMessages.GetRecentMessages#1_Request",
+        steamid1=str(client.user.id64),
+        steamid2=str(user.id64),
+        count=HISTORY_LIMIT,
+        rtime32_start_time=int(after.replace(tzinfo=timezone.utc).timestamp()),
+    )
+    msg = await asyncio.wait_for(
+        client.ws.wait_for(EMsg.ServiceMethodResponse, lambda m: m.header.job_id_target == job_id), timeout=TIMEOUT
+    )
+    if msg.header.eresult != steam.EResult.OK:
+        raise steam.WSException(msg)
+    return [
+        HistoryMessage(user, message.message, datetime.utcfromtimestamp(message.timestamp))
+        for message in sorted(msg.body.messages, key=lambda message: (message.timestamp, message.ordinal))
+        if message.accountid == user.id
+    ]
+
+
+class Fingerprints:
+    """A bounded record of the bot messages that have already been relayed so a backfill can skip them.
+
+    Fingerprints are of the author and content only, live messages and ones from the chat history don't
+    always agree on when they were sent.
+    """
+
+    def __init__(self, max_size: int = 1000):
+        self.order: Deque[str] = deque(maxlen=max_size)
+        self.seen: Set[str] = set()
+        self.latest: Optional[float] = None  # when the newest relayed message was sent
+
+    @staticmethod
+    def of(message: steam.Message) -> str:
+        key = f"{message.author.id64}:{message.content}".encode()
+        return hashlib.blake2b(key, digest_size=8).hexdigest()
+
+    def __contains__(self, message: steam.Message) -> bool:
+        return self.of(message) in self.seen
+
+    def __len__(self) -> int:
+        return len(self.seen)
+
+    def remember(self, fingerprint: str) -> None:
+        if fingerprint in self.seen:
+            return
+        if len(self.order) == self.order.maxlen:
+            self.seen.discard(self.order[0])
+        self.order.append(fingerprint)
+        self.seen.add(fingerprint)
+
+    def add(self, message: steam.Message) -> None:
+        self.remember(self.of(message))
+        self.latest = max(self.latest or 0, timestamp(message))
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"order": list(self.order), "latest": self.latest}
+
+    def update(self, data: Dict[str, Any]) -> None:
+        for fingerprint in data["order"]:
+            self.remember(fingerprint)
+        if data["latest"] is not None:
+            self.latest = max(self.latest or 0, data["latest"])
@@ -6,6 +6,7 @@ import discord
 from discord.ext import commands
 
 from .formats import human_join
+from .telemetry import waiting
 
 
 async def wait_for_bool(ctx: commands.Context) -> bool:
@@ -13,7 +14,8 @@ async def wait_for_bool(ctx: commands.Context) -> bool:
         return message.author == ctx.author
 
     while 1:
-        choice = await ctx.bot.wait_for("message", check=check)
+        with waiting("user"):
+            choice = await ctx.bot.wait_for("message", check=check)
         choice = choice.content.lower()
 
         if choice in ("yes", "y", "ye", "yea", "yeah", "true", "t", "on", "enable", "1",):
@@ -28,7 +30,8 @@ async def wait_for_any(ctx: commands.Context, lower=True) -> str:
     def check(message: discord.Message):
         return message.author == ctx.author
 
-    choice = await ctx.bot.wait_for("message", check=check)
+    with waiting("user"):
+        choice = await ctx.bot.wait_for("message", check=check)
     return choice.content.lower() if lower else choice.content
 
 
@@ -38,7 +41,8 @@ async def wait_for_options(ctx: commands.Context, *options: Tuple[str, ...]) ->
 
     while 1:
         lowered = [o.lower() for o in options]
-        choice = await ctx.bot.wait_for("message", check=check)
+        with waiting("user"):
+            choice = await ctx.bot.wait_for("message", check=check)
         choice = choice.content.lower()
 
         if choice in lowered:
@@ -55,7 +59,8 @@ async def wait_for_digit(ctx: commands.Context) -> str:
         return message.author == ctx.author
 
     while 1:
-        digit = await ctx.bot.wait_for("message", check=check)
+        with waiting("user"):
+            digit = await ctx.bot.wait_for("message", check=check)
         digit = digit.content.lower()
         try:
             float(digit)
@@ -70,7 +75,8 @@ async def wait_for_owners(ctx: commands.Context) -> bool:
         return message.author.id in ctx.bot.owner_ids
 
     while 1:
-        choice = await ctx.bot.wait_for("message", check=check)
+        with waiting("user"):
+            choice = await ctx.bot.wait_for("message", check=check)
         choice = choice.content.lower()
 
         if choice in ("yes", "y", "ye", "yea", "yeah", "true", "t", "on", "enable", "1"):
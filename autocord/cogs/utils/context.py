@@ -10,6 +10,9 @@ from discord import PartialEmoji, HTTPException, Message
 from discord.ext import commands
 import steam
 
+from .scheduler import Priority
+from .telemetry import waiting
+
 if TYPE_CHECKING:
     from ... import AutoCord
 
@@ -28,6 +31,16 @@ class Context(commands.Context):
     def steam_bots(self) -> List["steam.User"]:
         return self.bot.client.steam_bots
 
+    @property
+    def steam_bot(self) -> "steam.User":
+        return self.bot.client.steam_bots[0]
+
+    async def send(self, content=None, **kwargs) -> Message:
+        # replies to commands are the least urgent thing we send so they wait their turn
+        with waiting("discord"):
+            async with self.bot.scheduler.slot(Priority.COMMAND):
+                return await super().send(content, **kwargs)
+
     async def get_output(self, command: str) -> str:
         return await steam.utils.to_thread(getoutput, command)
 
@@ -43,7 +56,8 @@ class Context(commands.Context):
 
         await message.add_reaction("🗑️")
         try:
-            await self.bot.wait_for("reaction_add", timeout=timeout, check=check)
+            with waiting("user"):
+                await self.bot.wait_for("reaction_add", timeout=timeout, check=check)
         except asyncio.TimeoutError:
             try:
                 await message.clear_reactions()
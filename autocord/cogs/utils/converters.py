@@ -1,27 +1,103 @@
-from typing import TYPE_CHECKING, Optional
+import re
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import TYPE_CHECKING, Dict, Iterable, Iterator, Optional
 
 import steam
 from discord.ext import commands
-from steam.ext import commands as steam_commands
 
 if TYPE_CHECKING:
     from .context import Context
 
 
-class SteamCTX:
-    @classmethod
-    def from_discord_context(cls, context: "Context"):
-        self = cls()
-        self.bot = context.bot.client
-        return self
+PROFILE_URL = re.compile(r"(?:https?://)?(?:www\.)?steamcommunity\.com/profiles/(\d+)/?", re.IGNORECASE)
+CUSTOM_URL = re.compile(r"(?:https?://)?(?:www\.)?steamcommunity\.com/id/([\w-]+)/?", re.IGNORECASE)
+MAX_CUSTOM_URLS = 128
+
+
+class SteamBotIndex:
+    """Every way of referring to one of the steam bots, so finding one doesn't need to touch the network.
+
+    Bots are keyed by their id64, id32, name and profile URL. Custom URLs can only be resolved by asking
+    Steam, so they're looked up the first time they're used and remembered once Steam has resolved them.
+    """
+
+    def __init__(self, users: Iterable[steam.User] = (), custom_urls: "Optional[OrderedDict[str, int]]" = None):
+        self.users: Dict[int, steam.User] = {}
+        self.keys: Dict[str, steam.User] = {}
+        for user in users:
+            self.users[user.id64] = user
+            self.keys.setdefault(str(user.id64), user)
+            self.keys.setdefault(str(user.id), user)
+            self.keys.setdefault(user.name.lower(), user)
+        self.custom_urls: "OrderedDict[str, int]" = custom_urls if custom_urls is not None else OrderedDict()
+
+    def __contains__(self, user: steam.User) -> bool:
+        return user.id64 in self.users
+
+    def __iter__(self) -> Iterator[steam.User]:
+        return iter(self.users.values())
+
+    def __len__(self) -> int:
+        return len(self.users)
+
+    def get(self, argument: str) -> Optional[steam.User]:
+        argument = argument.strip().strip("<>")
+        match = PROFILE_URL.fullmatch(argument)
+        if match is not None:
+            return self.users.get(int(match.group(1)))
+        match = CUSTOM_URL.fullmatch(argument)
+        if match is not None:
+            id64 = self.custom_urls.get(match.group(1).lower())
+            return self.users.get(id64) if id64 is not None else None
+        return self.keys.get(argument.lower())
+
+    async def fetch(self, argument: str) -> Optional[steam.User]:
+        """Like :meth:`get` but resolves custom URLs that haven't been seen before."""
+        user = self.get(argument)
+        match = CUSTOM_URL.fullmatch(argument.strip().strip("<>"))
+        if user is not None or match is None:
+            return user
+        custom_url = match.group(1).lower()
+        if custom_url in self.custom_urls:
+            self.custom_urls.move_to_end(custom_url)
+            return None  # we've already looked it up and it isn't one of the bots
+        id64 = await steam.utils.steam64_from_url(f"https://steamcommunity.com/id/{custom_url}")
+        if id64 is None:  # this is the same whether it doesn't exist or steam is down, so it's not remembered
+            return None
+        self.custom_urls[custom_url] = id64
+        while len(self.custom_urls) > MAX_CUSTOM_URLS:
+            self.custom_urls.popitem(last=False)
+        return self.users.get(id64)
 
 
 class SteamBot(commands.Converter):
-    async def convert(self, ctx, argument) -> Optional[steam.User]:
-        old_ctx = ctx
-        ctx = SteamCTX.from_discord_context(ctx)
-        user = await steam_commands.UserConverter().convert(ctx, argument)
-        return user if user in old_ctx.steam_bots else None
+    """Converts an id64, id32, name, profile URL or custom URL into one of the steam bots."""
+
+    async def convert(self, ctx: "Context", argument: str) -> steam.User:
+        user = await ctx.bot.client.steam_bot_index.fetch(argument)
+        if user is None:
+            raise commands.BadArgument(f'"{argument}" isn\'t one of your steam bots')
+        return user
+
+
+class Since(commands.Converter):
+    """Converts either a relative time like ``3d`` or ``1w2h`` or a ``dd-mm-yyyy`` date into a datetime."""
+
+    UNITS = {"w": "weeks", "d": "days", "h": "hours", "m": "minutes", "s": "seconds"}
+    RELATIVE = re.compile(r"(\d+)([wdhms])")
+
+    async def convert(self, ctx, argument) -> datetime:
+        argument = argument.lower()
+        if re.fullmatch(r"(?:\d+[wdhms])+", argument):
+            delta = timedelta(
+                **{self.UNITS[unit]: int(amount) for amount, unit in self.RELATIVE.findall(argument)}
+            )
+            return datetime.now() - delta
+        try:
+            return datetime.strptime(argument, "%d-%m-%Y")
+        except ValueError:
+            raise commands.BadArgument(f'"{argument}" is not a time like 3d or a date like 01-08-2020') from None
 
 
 class CodeBlock(commands.Converter):
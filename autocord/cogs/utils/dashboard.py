@@ -0,0 +1,201 @@
+# -*- coding: utf-8 -*-
+
+import asyncio
+import json
+import logging
+import secrets
+from collections import deque
+from datetime import date
+from typing import TYPE_CHECKING, Any, Deque, Dict, List, Optional, Tuple
+
+from aiohttp import web
+from discord.ext import tasks
+
+if TYPE_CHECKING:
+    from ... import AutoCord
+
+log = logging.getLogger(__name__)
+
+KEEPALIVE = 15  # seconds between comments so proxies don't close idle streams
+Event = Tuple[int, str, str]  # id, name, json data
+
+
+class Broadcaster:
+    """One buffer of recent events that every viewer reads from at their own pace.
+
+    Publishing is the only place any work is done per event, viewers just wait for the next one and read
+    everything past the last id they saw, so it doesn't matter how many there are.
+
+    Ids start again from 0 every time the bot starts, so the ids sent to viewers are prefixed with an epoch
+    that's new each run and a browser reconnecting with an id from an earlier run is sent everything.
+    """
+
+    def __init__(self, size: int = 200):
+        self.events: Deque[Event] = deque(maxlen=size)
+        self.latest: Dict[str, Event] = {}  # events that are only worth seeing the newest of
+        self.id = 0
+        self.epoch = secrets.token_hex(4)
+        self._new = asyncio.Event()
+
+    def publish(self, name: str, data: Any, *, replay: bool = True) -> None:
+        self.id += 1
+        event = (self.id, name, json.dumps(data, default=str))
+        if replay:
+            self.events.append(event)
+        else:
+            self.latest[name] = event
+        new, self._new = self._new, asyncio.Event()
+        new.set()
+
+    def since(self, last_id: int) -> List[Event]:
+        missed = min(self.id - last_id, len(self.events))
+        events = [self.events[index] for index in range(len(self.events) - missed, len(self.events))]
+        events = [event for event in events if event[0] > last_id]
+        events.extend(event for event in self.latest.values() if event[0] > last_id)
+        return sorted(events)
+
+    def parse_id(self, event_id: Optional[str]) -> int:
+        """The id a viewer sent back as its ``Last-Event-ID``, or 0 if it isn't from this run."""
+        epoch, _, id = (event_id or "").partition("-")
+        if epoch != self.epoch:
+            return 0
+        try:
+            return int(id)
+        except ValueError:
+            return 0
+
+    async def wait(self, last_id: int) -> None:
+        if self.id <= last_id:
+            await self._new.wait()
+
+
+PAGE = """<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<title>tf2-autocord</title>
+<style>
+body { font-family: sans-serif; background: #2f3136; color: #dcddde; margin: 2em; }
+#counters { display: flex; flex-wrap: wrap; gap: 1em; }
+.counter { background: #202225; padding: .5em 1em; border-radius: 4px; }
+.counter b { display: block; font-size: 1.5em; }
+#events div { border-left: 4px solid #7289da; background: #202225; margin: .5em 0; padding: .5em; white-space: pre-wrap; }
+#events .trade { border-color: #5c7e10; }
+#events .review { border-color: #f04747; }
+#queue { margin: 1em 0; color: #b9bbbe; }
+</style>
+</head>
+<body>
+<h1>tf2-autocord</h1>
+<div id="counters"></div>
+<div id="queue"></div>
+<div id="events"></div>
+<script>
+const source = new EventSource("events");
+const events = document.getElementById("events");
+const counters = document.getElementById("counters");
+const queue = document.getElementById("queue");
+function show(kind, data) {
+    const div = document.createElement("div");
+    div.className = kind;
+    div.textContent = `${new Date(data.timestamp * 1000).toLocaleString()} ${data.author}\\n${data.content}`;
+    events.prepend(div);
+    while (events.children.length > 200) events.lastChild.remove();
+}
+for (const kind of ["trade", "review", "message"]) source.addEventListener(kind, e => show(kind, JSON.parse(e.data)));
+source.addEventListener("queue", e => {
+    const data = JSON.parse(e.data);
+    const depth = Object.entries(data.depth).map(([lane, count]) => `${lane} ${count}`).join(", ");
+    queue.textContent = `Outbox: ${depth} (last ${data.action} #${data.id} in ${data.lane})`;
+});
+source.addEventListener("counters", e => {
+    counters.innerHTML = "";
+    for (const [name, value] of Object.entries(JSON.parse(e.data))) {
+        const div = document.createElement("div");
+        div.className = "counter";
+        div.innerHTML = `<b></b>${name.replace(/_/g, " ")}`;
+        div.firstChild.textContent = value;
+        counters.append(div);
+    }
+});
+</script>
+</body>
+</html>
+"""
+
+
+class Dashboard:
+    """A small local web page that streams what's being relayed over Server-Sent Events."""
+
+    def __init__(self, bot: "AutoCord", port: int, host: str = "127.0.0.1"):
+        self.bot = bot
+        self.host = host
+        self.port = port
+        self.viewers = 0
+        self.runner: Optional[web.AppRunner] = None
+
+    async def start(self) -> None:
+        app = web.Application()
+        app.router.add_get("/", self.index)
+        app.router.add_get("/events", self.stream)
+        self.runner = web.AppRunner(app)
+        await self.runner.setup()
+        await web.TCPSite(self.runner, self.host, self.port).start()
+        self.publish_counters.start()
+        log.info(f"Serving the dashboard on http://{self.host}:{self.port}")
+
+    async def close(self) -> None:
+        self.publish_counters.cancel()
+        if self.runner is not None:
+            await self.runner.cleanup()
+
+    def counters(self) -> Dict[str, Any]:
+        bot = self.bot
+        today = bot.client.profits.by_bot([date.today().toordinal()]).values()
+        return {
+            "steam": "connected" if bot.supervisor.up else "disconnected",
+            "steam_availability": f"{bot.supervisor.availability:.2%}",
+            "trades_today": sum(aggregate.trades for aggregate in today),
+            "net_keys_today": f"{sum(aggregate.net_keys for aggregate in today):+g}",
+            "net_metal_today": f"{sum(aggregate.net_metal for aggregate in today):+.2f}",
+            "outbox": len(bot.outbox),
+            "waiting_to_send": sum(bot.scheduler.waiting().values()),
+            "viewers": self.viewers,
+        }
+
+    @tasks.loop(seconds=5)
+    async def publish_counters(self):
+        if self.viewers:  # nobody is going to see them otherwise
+            self.bot.events.publish("counters", self.counters(), replay=False)
+
+    async def index(self, request: web.Request) -> web.Response:
+        return web.Response(text=PAGE, content_type="text/html")
+
+    async def stream(self, request: web.Request) -> web.StreamResponse:
+        response = web.StreamResponse(headers={"Content-Type": "text/event-stream", "Cache-Control": "no-cache"})
+        await response.prepare(request)
+        events = self.bot.events
+        last_id = events.parse_id(request.headers.get("Last-Event-ID"))
+        self.viewers += 1
+        try:
+            events.publish("counters", self.counters(), replay=False)
+            while True:
+                new = events.since(last_id)
+                if new:
+                    await response.write(
+                        "".join(
+                            f"id: {events.epoch}-{id}\nevent: {name}\ndata: {data}\n\n" for id, name, data in new
+                        ).encode()
+                    )
+                    last_id = new[-1][0]
+                    continue
+                try:
+                    await asyncio.wait_for(events.wait(last_id), KEEPALIVE)
+                except asyncio.TimeoutError:
+                    await response.write(b": keepalive\n\n")
+        except ConnectionResetError:
+            pass
+        finally:
+            self.viewers -= 1
+        return response
+
@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+
+import csv
+import gzip
+import io
+import json
+import tempfile
+from typing import IO, Any, Dict, Iterable, Optional, Tuple
+
+FIELDS = ("timestamp", "trade_id", "bot", "trader", "status", "summary")
+FORMATS = ("csv", "jsonl")
+MAX_PART_SIZE = 8 * 1024 * 1024 - 256 * 1024  # discord's attachment limit with room for gzip's buffered output
+SPOOL_SIZE = 1024 * 1024  # parts bigger than this are spooled to disk rather than kept in memory
+
+
+class PartWriter:
+    """Writes records to gzip compressed parts, starting a new part before one gets too big to upload.
+
+    Only the part being written is ever held, and past :data:`SPOOL_SIZE` it lives in a temporary file.
+    """
+
+    def __init__(self, name: str, format: str):
+        if format not in FORMATS:
+            raise ValueError(f"{format} is not one of {', '.join(FORMATS)}")
+        self.name = name
+        self.format = format
+        self.parts = 0
+        self.rows = 0
+        self._open()
+
+    def _open(self) -> None:
+        self.file: IO[bytes] = tempfile.SpooledTemporaryFile(max_size=SPOOL_SIZE)
+        self.gzip = gzip.GzipFile(fileobj=self.file, mode="wb")
+        self.text = io.TextIOWrapper(self.gzip, encoding="utf-8", newline="")
+        self.writer = csv.DictWriter(self.text, FIELDS, extrasaction="ignore") if self.format == "csv" else None
+        if self.writer is not None:
+            self.writer.writeheader()
+        self.rows = 0
+
+    def _close(self) -> Tuple[IO[bytes], str]:
+        self.text.flush()
+        self.text.detach()
+        self.gzip.close()  # this doesn't close the underlying file
+        self.file.seek(0)
+        self.parts += 1
+        return self.file, f"{self.name}-{self.parts}.{self.format}.gz"
+
+    def write(self, records: Iterable[Dict[str, Any]]) -> Optional[Tuple[IO[bytes], str]]:
+        """Write a chunk of records, returning the previous part and its file name if it's full."""
+        for record in records:
+            if self.writer is not None:
+                self.writer.writerow(record)
+            else:
+                self.text.write(f"{json.dumps(record)}\n")
+            self.rows += 1
+        self.text.flush()
+        if self.file.tell() < MAX_PART_SIZE:
+            return None
+        part = self._close()
+        self._open()
+        return part
+
+    def finish(self) -> Optional[Tuple[IO[bytes], str]]:
+        """Close the last part, returning it unless it's empty and there were earlier parts."""
+        if self.rows == 0 and self.parts:
+            self.text.detach()
+            self.file.close()
+            return None
+        return self._close()
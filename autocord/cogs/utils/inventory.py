@@ -0,0 +1,240 @@
+# -*- coding: utf-8 -*-
+
+import asyncio
+import json
+import logging
+import time
+from array import array
+from bisect import bisect_right
+from collections import Counter
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import steam
+
+from .storage import data_path, load_json
+
+log = logging.getLogger(__name__)
+
+MAX_SNAPSHOTS = 100
+MAX_AGE = 60 * 60  # re-download an inventory that hasn't traded at most once an hour
+COMPACT_AFTER = 2 * MAX_SNAPSHOTS  # rewrite the journal once it has this many records in it
+
+
+class Snapshot:
+    """The counts of each item in an inventory, stored as two parallel arrays sorted by interned name id.
+
+    ``timestamp`` is when the inventory was first seen like this and ``checked`` is when it was last seen.
+    """
+
+    __slots__ = ("timestamp", "items", "counts", "checked")
+
+    def __init__(self, timestamp: float, items: array, counts: array, checked: Optional[float] = None):
+        self.timestamp = timestamp
+        self.items = items
+        self.counts = counts
+        self.checked = checked if checked is not None else timestamp
+
+    @property
+    def total(self) -> int:
+        return sum(self.counts)
+
+    def __eq__(self, other: "Snapshot") -> bool:
+        return self.items == other.items and self.counts == other.counts
+
+    def diff(self, new: "Snapshot") -> Tuple[List[Tuple[int, int]], List[Tuple[int, int]]]:
+        """The ``(name id, count)`` of the items that came in and went out between this and ``new``.
+
+        Both snapshots are sorted so this is a single merge over the two of them.
+        """
+        came_in = []
+        went_out = []
+        i = j = 0
+        old_items, old_counts, new_items, new_counts = self.items, self.counts, new.items, new.counts
+        while i < len(old_items) and j < len(new_items):
+            if old_items[i] == new_items[j]:
+                change = new_counts[j] - old_counts[i]
+                if change > 0:
+                    came_in.append((new_items[j], change))
+                elif change < 0:
+                    went_out.append((old_items[i], -change))
+                i += 1
+                j += 1
+            elif old_items[i] < new_items[j]:
+                went_out.append((old_items[i], old_counts[i]))
+                i += 1
+            else:
+                came_in.append((new_items[j], new_counts[j]))
+                j += 1
+        went_out.extend(zip(old_items[i:], old_counts[i:]))
+        came_in.extend(zip(new_items[j:], new_counts[j:]))
+        return came_in, went_out
+
+
+class InventoryHistory:
+    """The snapshots taken of one steam bot's inventory with the item names interned into a shared table.
+
+    They are kept in a journal that each refresh appends to, a new snapshot brings the names it interned with it
+    and an unchanged inventory only appends when it was checked. The journal is rewritten once it has built up
+    :data:`COMPACT_AFTER` records.
+    """
+
+    def __init__(self, id64: int):
+        self.id64 = id64
+        self.path = data_path(f"inventory-{id64}.jsonl")
+        self.names: List[str] = []
+        self.snapshots: List[Snapshot] = []
+        self.records = 0
+        self._load()
+        self.ids: Dict[str, int] = {name: id for id, name in enumerate(self.names)}
+        self.written = len(self.names)  # how many of the names are in the journal
+        self.dirty = True  # we don't know what happened while we were offline
+
+    def _load(self) -> None:
+        try:
+            fp = self.path.open()
+        except FileNotFoundError:
+            return self._migrate()
+        with fp:
+            for line in fp:
+                try:
+                    record = json.loads(line)
+                except ValueError:  # the last line might have been cut off by a crash
+                    continue
+                self.records += 1
+                if record["op"] == "snapshot":
+                    self.names.extend(record["names"])
+                    self.snapshots.append(
+                        Snapshot(record["timestamp"], array("I", record["items"]), array("I", record["counts"]))
+                    )
+                elif record["op"] == "checked" and self.snapshots:
+                    self.snapshots[-1].checked = record["timestamp"]
+        del self.snapshots[:-MAX_SNAPSHOTS]
+
+    def _migrate(self) -> None:
+        """Move the history over from when it was rewritten as one JSON file each time."""
+        old = self.path.with_suffix(".json")
+        data = load_json(old)
+        if data is None:
+            return
+        self.names = data["names"]
+        self.snapshots = [
+            Snapshot(timestamp, array("I", items), array("I", counts), *checked)
+            for timestamp, items, counts, *checked in data["snapshots"]
+        ]
+        self._compact()
+        old.unlink()
+
+    def _write(self, op: str, **record: Any) -> None:
+        with self.path.open("a") as fp:
+            fp.write(f'{json.dumps({"op": op, **record}, separators=(",", ":"))}\n')
+        self.records += 1
+        if self.records >= COMPACT_AFTER:
+            self._compact()
+
+    def _compact(self) -> None:
+        tmp = self.path.with_name(f"{self.path.name}.tmp")
+        names = self.names
+        with tmp.open("w") as fp:
+            for snapshot in self.snapshots:
+                record = {
+                    "op": "snapshot",
+                    "names": names,
+                    "timestamp": snapshot.timestamp,
+                    "items": snapshot.items.tolist(),
+                    "counts": snapshot.counts.tolist(),
+                }
+                fp.write(f'{json.dumps(record, separators=(",", ":"))}\n')
+                names = []  # the first snapshot brings the whole table
+            if self.snapshots and self.latest.checked != self.latest.timestamp:
+                fp.write(f'{json.dumps({"op": "checked", "timestamp": self.latest.checked})}\n')
+        tmp.replace(self.path)
+        self.records = len(self.snapshots) + 1
+        self.written = len(self.names) if self.snapshots else 0
+
+    @property
+    def latest(self) -> Optional[Snapshot]:
+        return self.snapshots[-1] if self.snapshots else None
+
+    @property
+    def stale(self) -> bool:
+        return self.dirty or self.latest is None or time.time() - self.latest.checked > MAX_AGE
+
+    def intern(self, name: str) -> int:
+        try:
+            return self.ids[name]
+        except KeyError:
+            id = self.ids[name] = len(self.names)
+            self.names.append(name)
+            return id
+
+    def add(self, names: Iterable[str]) -> Snapshot:
+        """Record a new snapshot from the names of every item in the inventory.
+
+        If nothing changed since the last snapshot, it's marked as checked instead of storing a copy, its
+        timestamp stays as when the inventory first looked like this so :meth:`at` still finds the right one.
+        """
+        counts = Counter(self.intern(name) for name in names)
+        ids = sorted(counts)
+        snapshot = Snapshot(time.time(), array("I", ids), array("I", (counts[id] for id in ids)))
+        if self.latest is not None and self.latest == snapshot:
+            self.latest.checked = snapshot.timestamp
+            self._write("checked", timestamp=snapshot.timestamp)
+        else:
+            self.snapshots.append(snapshot)
+            del self.snapshots[:-MAX_SNAPSHOTS]
+            new_names = self.names[self.written :]
+            self.written = len(self.names)
+            self._write(
+                "snapshot",
+                names=new_names,
+                timestamp=snapshot.timestamp,
+                items=snapshot.items.tolist(),
+                counts=snapshot.counts.tolist(),
+            )
+        return self.latest
+
+    def at(self, timestamp: float) -> Optional[Snapshot]:
+        """The last snapshot taken at or before ``timestamp``, or the oldest one if there isn't one that old."""
+        if not self.snapshots:
+            return None
+        idx = bisect_right([snapshot.timestamp for snapshot in self.snapshots], timestamp)
+        return self.snapshots[max(idx - 1, 0)]
+
+
+class Inventories:
+    """Keeps an :class:`InventoryHistory` for each steam bot and only downloads inventories that may have changed.
+
+    Each bot's inventory is only downloaded once at a time, anything that asks while it is waits for that one.
+    """
+
+    def __init__(self):
+        self.histories: Dict[int, InventoryHistory] = {}
+        self.locks: Dict[int, asyncio.Lock] = {}
+
+    def __getitem__(self, id64: int) -> InventoryHistory:
+        try:
+            return self.histories[id64]
+        except KeyError:
+            history = self.histories[id64] = InventoryHistory(id64)
+            return history
+
+    def mark_dirty(self, id64: int) -> None:
+        self[id64].dirty = True
+
+    async def refresh(self, user: steam.User, *, force: bool = False) -> Optional[Snapshot]:
+        history = self[user.id64]
+        try:
+            lock = self.locks[user.id64]
+        except KeyError:
+            lock = self.locks[user.id64] = asyncio.Lock()
+        async with lock:
+            if not force and not history.stale:
+                return history.latest
+            history.dirty = False  # a trade that's accepted while we're downloading marks it dirty again
+            try:
+                inventory = await user.inventory(steam.TF2)
+            except steam.HTTPException as exc:
+                log.warning(f"Failed to fetch {user}'s inventory", exc_info=exc)
+                history.dirty = True
+                return history.latest
+            return history.add(item.name for item in inventory.items)
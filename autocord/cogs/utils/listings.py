@@ -0,0 +1,274 @@
+# -*- coding: utf-8 -*-
+
+import csv
+import hashlib
+import io
+import json
+import math
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Mapping, NamedTuple, Optional, Tuple
+
+QUALITIES = ("Unique", "Strange", "Vintage", "Genuine", "Haunted", "Collector's")
+INTENTS = ("bank", "buy", "sell")
+KILLSTREAKS = {
+    alias: tier
+    for tier, aliases in (
+        (1, ("1", "k", "killstreak", "basic")),
+        (2, ("2", "s", "specialized")),
+        (3, ("3", "p", "professional")),
+    )
+    for alias in aliases
+}
+KILLSTREAK_NAMES = {1: "Killstreak", 2: "Specialized Killstreak", 3: "Professional Killstreak"}
+TRUE = ("yes", "y", "true", "t", "on", "enable", "1")
+FALSE = ("no", "n", "false", "f", "off", "disable", "0")
+
+
+def to_bool(value: str) -> bool:
+    value = value.lower()
+    if value in TRUE:
+        return True
+    if value in FALSE:
+        return False
+    raise ValueError(f'"{value}" is not a yes or no')
+
+
+def to_number(value: str) -> float:
+    try:
+        number = float(value)
+    except ValueError:
+        raise ValueError(f'"{value}" is not a number') from None
+    if not math.isfinite(number):
+        raise ValueError(f'"{value}" is not a number')
+    if number < 0:
+        raise ValueError(f'"{value}" can\'t be negative')
+    return number
+
+
+def to_limit(value: str) -> int:
+    try:
+        limit = int(value)
+    except ValueError:
+        raise ValueError(f'"{value}" is not a whole number') from None
+    if limit < -1:
+        raise ValueError(f'"{value}" isn\'t a valid stock limit, use -1 for no limit')
+    return limit
+
+
+def to_quality(value: str) -> str:
+    for quality in QUALITIES:
+        if quality.lower() == value.lower():
+            return quality
+    raise ValueError(f'"{value}" is not a quality, use one of {", ".join(QUALITIES)}')
+
+
+def to_intent(value: str) -> str:
+    if value.lower() not in INTENTS:
+        raise ValueError(f'"{value}" is not an intent, use one of {", ".join(INTENTS)}')
+    return value.lower()
+
+
+def to_killstreak(value: str) -> int:
+    try:
+        return KILLSTREAKS[value.lower()]
+    except KeyError:
+        raise ValueError(f'"{value}" is not a killstreak tier, use 1, 2 or 3') from None
+
+
+class Option(NamedTuple):
+    name: str
+    convert: Callable[[str], Any]
+    aliases: Tuple[str, ...] = ()
+    identifies: bool = False  # whether this is part of the item's name rather than its listing
+
+    @property
+    def param(self) -> str:
+        return self.name.replace("_", ".")
+
+
+# the order here is the order the params end up in the command
+OPTIONS = (
+    Option("buy_keys", to_number, ("buy.keys",)),
+    Option("buy_metal", to_number, ("buy.metal", "buy_ref")),
+    Option("sell_keys", to_number, ("sell.keys",)),
+    Option("sell_metal", to_number, ("sell.metal", "sell_ref")),
+    Option("limit", to_limit, ("l", "max")),
+    Option("intent", to_intent, ("i",)),
+    Option("autoprice", to_bool, ("ap", "autopricing")),
+    Option("quality", to_quality, ("q",), identifies=True),
+    Option("craftable", to_bool, ("c",), identifies=True),
+    Option("australium", to_bool, ("au",), identifies=True),
+    Option("killstreak", to_killstreak, ("k", "ks"), identifies=True),
+    Option("effect", str, ("e",), identifies=True),
+)
+LOOKUP: Dict[str, Option] = {alias: option for option in OPTIONS for alias in (option.name, *option.aliases)}
+ACTIONS = {"add": "add", "a": "add", "update": "update", "u": "update", "remove": "remove", "r": "remove"}
+
+
+class ListingError(ValueError):
+    def __init__(self, row: int, message: str):
+        self.row = row
+        super().__init__(f"Row {row}: {message}")
+
+
+def parse_row(action: str, row: Mapping[str, Optional[str]], number: int) -> Dict[str, Any]:
+    """Validate a single row of raw option values, raising :exc:`ListingError` for the first problem found."""
+    # headers are matched however they're cased, extra values without a header are keyed by None and ignored
+    row = {key.strip().lower(): value for key, value in row.items() if key is not None}
+    name = (row.get("name") or "").strip()
+    if not name:
+        raise ListingError(number, "is missing the item's name")
+    parsed: Dict[str, Any] = {"name": name}
+    for key, value in row.items():
+        if key == "name" or value is None or not value.strip():
+            continue
+        try:
+            option = LOOKUP[key]
+        except KeyError:
+            raise ListingError(number, f'"{key}" is not an option') from None
+        if action == "remove" and not option.identifies:
+            raise ListingError(number, f"{option.name} can't be used when removing an item")
+        try:
+            parsed[option.name] = option.convert(value.strip())
+        except ValueError as exc:
+            raise ListingError(number, str(exc)) from None
+    return parsed
+
+
+def item_name(listing: Dict[str, Any]) -> str:
+    """The full name of the item, which is how update and remove know which listing to change."""
+    parts = []
+    if listing.get("craftable") is False:
+        parts.append("Non-Craftable")
+    quality = listing.get("quality")
+    if listing.get("australium") and quality is None:
+        quality = "Strange"  # australiums are always strange
+    if quality is not None and quality != "Unique":
+        parts.append(quality)
+    if listing.get("effect"):
+        parts.append(listing["effect"])
+    if listing.get("killstreak"):
+        parts.append(KILLSTREAK_NAMES[listing["killstreak"]])
+    if listing.get("australium"):
+        parts.append("Australium")
+    parts.append(listing["name"])
+    return " ".join(parts)
+
+
+def format_value(value: Any) -> str:
+    if isinstance(value, bool):
+        return str(value).lower()
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+
+def compile_listing(action: str, listing: Dict[str, Any]) -> str:
+    if action == "add":
+        # add takes the base name and describes the item with params
+        params = [f"name={listing['name']}"]
+        if listing.get("australium") and "quality" not in listing:
+            listing = {**listing, "quality": "Strange"}  # australiums are always strange
+        for option in OPTIONS:
+            if option.name in listing:
+                params.append(f"{option.param}={format_value(listing[option.name])}")
+        return f"!add {'&'.join(params)}"
+
+    params = [f"name={item_name(listing)}"]
+    params.extend(
+        f"{option.param}={format_value(listing[option.name])}"
+        for option in OPTIONS
+        if not option.identifies and option.name in listing
+    )
+    return f"!{action} {'&'.join(params)}"
+
+
+def compile_rows(action: str, rows: Iterable[Mapping[str, Optional[str]]]) -> Tuple[List[str], List[ListingError]]:
+    """Compile every row into a command, validating all of them before anything is sent."""
+    commands = []
+    errors = []
+    for number, row in enumerate(rows, start=1):
+        try:
+            commands.append(compile_listing(action, parse_row(action, row, number)))
+        except ListingError as exc:
+            errors.append(exc)
+    return commands, errors
+
+
+def parse_line(line: str) -> Dict[str, str]:
+    """Parse ``name&option=value&option=value`` in the same style the bot's own commands use."""
+    name, *params = line.split("&")
+    row = {"name": name.strip()}
+    for param in params:
+        key, sep, value = param.partition("=")
+        if not sep:
+            raise ListingError(1, f'"{param}" needs to be written like option=value')
+        row[key.strip()] = value
+    return row
+
+
+def parse_csv(data: str) -> List[Dict[str, Optional[str]]]:
+    return list(csv.DictReader(io.StringIO(data)))
+
+
+PRICELIST = "pricelist.json"
+PRICELIST_INTENTS = ("buy", "sell", "bank")  # the bot stores intents as their index in this
+LISTING_OPTIONS = tuple(option.name for option in OPTIONS if not option.identifies)
+
+
+def read_pricelist(folder: str) -> Dict[str, Dict[str, Any]]:
+    """Read the listings in a bot's pricelist keyed by their lower case full name."""
+    with (Path(folder) / PRICELIST).open(encoding="utf-8") as fp:
+        entries = json.load(fp)
+    listings = {}
+    for entry in entries:
+        listing = {
+            "name": entry["name"],
+            "autoprice": entry.get("autoprice", False),
+            "limit": entry.get("max", -1),
+        }
+        intent = entry.get("intent")
+        if isinstance(intent, int) and 0 <= intent < len(PRICELIST_INTENTS):
+            listing["intent"] = PRICELIST_INTENTS[intent]
+        for side in ("buy", "sell"):
+            price = entry.get(side) or {}
+            listing[f"{side}_keys"] = price.get("keys", 0)
+            listing[f"{side}_metal"] = price.get("metal", 0)
+        listings[entry["name"].lower()] = listing
+    return listings
+
+
+def row_hash(listing: Dict[str, Any], options: Iterable[str]) -> bytes:
+    values = []
+    for option in options:
+        value = listing.get(option)
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            value = round(float(value), 2)  # metal is only ever to 2 decimal places
+        values.append(format_value(value))
+    return hashlib.blake2b("\0".join(values).encode(), digest_size=8).digest()
+
+
+def diff_listings(
+    desired: Iterable[Dict[str, Any]], current: Dict[str, Dict[str, Any]]
+) -> Tuple[List[str], List[str], List[str]]:
+    """The add, update and remove commands that turn the ``current`` pricelist into the ``desired`` one.
+
+    Rows are compared by hashing the options the desired row sets, so options that are left out are left
+    as they are and rows that haven't changed cost a dict lookup and a hash.
+    """
+    adds, updates = [], []
+    seen = set()
+    for listing in desired:
+        key = item_name(listing).lower()
+        if key in seen:
+            continue  # the first row for an item wins
+        seen.add(key)
+        existing = current.get(key)
+        if existing is None:
+            adds.append(compile_listing("add", listing))
+            continue
+        options = [option for option in LISTING_OPTIONS if option in listing]
+        if options and row_hash(listing, options) != row_hash(existing, options):
+            updates.append(compile_listing("update", listing))
+    removes = [f"!remove name={listing['name']}" for key, listing in current.items() if key not in seen]
+    return adds, updates, removes
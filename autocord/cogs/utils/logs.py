@@ -0,0 +1,115 @@
+# -*- coding: utf-8 -*-
+
+import json
+import mmap
+import re
+from bisect import bisect_left
+from datetime import datetime
+from pathlib import Path
+from typing import Iterator, List, Optional, Tuple
+
+LOGS = Path("logs")
+# matches the asctime at the start of each record, see AutoCord.setup_logging
+TIMESTAMP = re.compile(rb"^(\d{4}-\d{2}-\d{2} \d{2}:\d{2}):\d{2}", re.MULTILINE)
+
+
+def log_files() -> List[Path]:
+    """Every log file in the order they were started.
+
+    A file is named after the day the bot was started and is written to until it stops, so the name says nothing
+    about how recent the records at the end of it are.
+    """
+    files = []
+    for file in LOGS.glob("out--*.log"):
+        try:
+            date = datetime.strptime(file.stem[5:], "%d-%m-%Y")
+        except ValueError:
+            continue
+        files.append((date, file))
+    return [file for _, file in sorted(files)]
+
+
+class LogIndex:
+    """A sidecar index mapping the first record of each minute in a log file to its byte offset.
+
+    The index is stored next to the log as ``.<name>.idx`` and only ever extended from the last
+    offset it covered, so a search over an old file never has to rescan it.
+    """
+
+    def __init__(self, file: Path):
+        self.file = file
+        self.path = file.with_name(f".{file.name}.idx")
+        self.size = 0
+        self.timestamps: List[float] = []
+        self.offsets: List[int] = []
+        try:
+            data = json.loads(self.path.read_text())
+        except (OSError, ValueError):
+            pass
+        else:
+            self.size = data["size"]
+            self.timestamps = data["timestamps"]
+            self.offsets = data["offsets"]
+
+    def update(self, buffer: mmap.mmap) -> None:
+        if len(buffer) < self.size:  # the file was truncated so start again
+            self.size = 0
+            self.timestamps.clear()
+            self.offsets.clear()
+        end = buffer.rfind(b"\n", self.size) + 1  # don't index a half written line
+        if end <= self.size:
+            return
+        last = self.timestamps[-1] if self.timestamps else None
+        for match in TIMESTAMP.finditer(buffer, self.size, end):
+            timestamp = datetime.strptime(match.group(1).decode(), "%Y-%m-%d %H:%M").timestamp()
+            if timestamp != last:
+                self.timestamps.append(timestamp)
+                self.offsets.append(match.start())
+                last = timestamp
+        self.size = end
+        tmp = self.path.with_suffix(".tmp")
+        tmp.write_text(json.dumps({"size": self.size, "timestamps": self.timestamps, "offsets": self.offsets}))
+        tmp.replace(self.path)
+
+    def ends_before(self, since: datetime) -> bool:
+        """Whether every record indexed was logged before the minute ``since`` falls in."""
+        return bool(self.timestamps) and self.timestamps[-1] < since.replace(second=0, microsecond=0).timestamp()
+
+    def seek(self, since: Optional[datetime]) -> int:
+        """The offset of the first record logged in the same minute or after ``since``."""
+        if since is None or not self.timestamps:
+            return 0
+        # the index is per minute so round down to keep records from the minute ``since`` falls in
+        idx = bisect_left(self.timestamps, since.replace(second=0, microsecond=0).timestamp())
+        return self.offsets[idx] if idx < len(self.offsets) else self.size
+
+
+def search(pattern: "re.Pattern[bytes]", since: Optional[datetime] = None) -> Iterator[Tuple[str, str]]:
+    """Lazily yield ``(file name, line)`` for every line matching ``pattern``.
+
+    This does blocking IO so it should be driven from a worker thread.
+    """
+    for file in log_files():
+        with file.open("rb") as fp:
+            try:
+                buffer = mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:  # empty files can't be mapped
+                continue
+            with buffer:
+                index = LogIndex(file)
+                index.update(buffer)
+                if since is not None and index.ends_before(since):
+                    continue
+                position = index.seek(since)
+                while True:
+                    match = pattern.search(buffer, position)
+                    if match is None:
+                        break
+                    # yield the whole line and carry on from the next one so a line is only reported once
+                    start = buffer.rfind(b"\n", 0, match.start()) + 1
+                    end = buffer.find(b"\n", match.end())
+                    if end == -1:
+                        yield file.name, buffer[start:].decode(errors="replace")
+                        break
+                    yield file.name, buffer[start:end].decode(errors="replace")
+                    position = end + 1
@@ -0,0 +1,303 @@
+# -*- coding: utf-8 -*-
+
+import asyncio
+import json
+import logging
+from collections import OrderedDict
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Tuple
+
+import aiohttp
+import discord
+
+from . import tracing
+from .scheduler import Priority, Scheduler
+from .storage import data_path
+
+if TYPE_CHECKING:
+    from ... import AutoCord
+
+log = logging.getLogger(__name__)
+
+MAX_ATTEMPTS = 5  # deliveries that fail this many times while connected are dead-lettered
+MAX_BACKOFF = 60
+COMPACT_AFTER = 500  # rewrite the journal once this many delivered entries are sitting in it
+
+TRANSIENT_ERRORS = (aiohttp.ClientError, OSError, asyncio.TimeoutError, discord.GatewayNotFound)
+
+
+class UndeliverableError(Exception):
+    """Raised when the destination of an outbox entry can't be found."""
+
+
+class Outbox:
+    """A disk-backed queue of messages waiting to be delivered to Discord.
+
+    Every entry is appended to a journal before delivery is attempted and acknowledged once it has
+    been sent, so anything that couldn't be delivered because Discord was unreachable is replayed in
+    order when the bot can talk to Discord again. Entries that keep failing while we are connected
+    (missing permissions, deleted channels) are moved to a dead-letter file for an owner to look at.
+
+    Each :class:`Priority` has its own lane which is delivered in order, the lanes share the
+    :class:`Scheduler`'s rate limit so a backlog of routine messages can't hold up an offer review.
+    """
+
+    def __init__(self, bot: "AutoCord", scheduler: Scheduler, name: str = "outbox"):
+        self.bot = bot
+        self.scheduler = scheduler
+        self.path = data_path(f"{name}.jsonl")
+        self.dead_path = data_path(f"{name}-dead.jsonl")
+        self.lanes: Dict[Priority, "OrderedDict[int, Dict[str, Any]]"] = {
+            priority: OrderedDict() for priority in Priority
+        }
+        self.futures: Dict[int, "asyncio.Future[Optional[discord.Message]]"] = {}
+        self.traces: Dict[int, tracing.Trace] = {}  # these aren't journaled, a trace doesn't outlive the process
+        self.next_id = 0
+        self.delivered = 0
+        self._wakeups = {priority: asyncio.Event() for priority in Priority}
+        self._tasks: List[asyncio.Task] = []
+        self.closed = False
+        self._load()
+        self._journal = self.path.open("a")
+
+    @property
+    def pending(self) -> List[Dict[str, Any]]:
+        """Every undelivered entry in the order they were queued."""
+        return sorted((entry for lane in self.lanes.values() for entry in lane.values()), key=lambda e: e["id"])
+
+    def _lane(self, entry: Dict[str, Any]) -> "OrderedDict[int, Dict[str, Any]]":
+        return self.lanes[Priority(entry.get("priority", Priority.INFO))]
+
+    def _load(self) -> None:
+        try:
+            fp = self.path.open()
+        except FileNotFoundError:
+            return
+        pending: Dict[int, Dict[str, Any]] = {}
+        with fp:
+            for line in fp:
+                try:
+                    record = json.loads(line)
+                except ValueError:  # the last line might have been cut off by a crash
+                    continue
+                op = record.pop("op")
+                if op == "put":
+                    pending[record["id"]] = record
+                elif op == "ack":
+                    pending.pop(record["id"], None)
+                elif op == "fail" and record["id"] in pending:
+                    pending[record["id"]]["attempts"] = record["attempts"]
+        for entry in pending.values():
+            self._lane(entry)[entry["id"]] = entry
+        if pending:
+            self.next_id = max(pending) + 1
+            log.info(f"Loaded {len(pending)} undelivered messages from the outbox")
+        self._compact()
+
+    def _compact(self) -> None:
+        tmp = self.path.with_name(f"{self.path.name}.tmp")
+        with tmp.open("w") as fp:
+            for entry in self.pending:
+                fp.write(f'{json.dumps({"op": "put", **entry})}\n')
+        tmp.replace(self.path)
+        self.delivered = 0
+
+    def _write(self, op: str, **record: Any) -> None:
+        self._journal.write(f'{json.dumps({"op": op, **record})}\n')
+        self._journal.flush()
+
+    def __len__(self) -> int:
+        return sum(len(lane) for lane in self.lanes.values())
+
+    def start(self) -> None:
+        if not self._tasks:
+            self._tasks = [self.bot.loop.create_task(self._worker(priority)) for priority in Priority]
+
+    def wakeup(self) -> None:
+        """Retry any pending deliveries straight away, this should be called after reconnecting."""
+        for wakeup in self._wakeups.values():
+            wakeup.set()
+
+    async def close(self) -> None:
+        self.closed = True
+        for task in self._tasks:
+            task.cancel()
+        self._journal.close()
+
+    def put(
+        self,
+        destination: Tuple[str, int],
+        content: Optional[str] = None,
+        *,
+        embed: Optional[discord.Embed] = None,
+        edit: Optional[Tuple[int, int]] = None,
+        priority: Priority = Priority.INFO,
+    ) -> "asyncio.Future[Optional[discord.Message]]":
+        """Queue a message for delivery. The returned future is set to the sent message once it's delivered.
+
+        If ``edit`` is the channel and message id of an existing message, that message is edited instead
+        and the future is set to ``None``. If it has since been deleted the message is posted again.
+        Once the outbox has been closed the message is dropped and the future is set to ``None`` straight away.
+        """
+        if self.closed:
+            log.warning(f"Dropping a message to {destination[0]} {destination[1]} as the outbox has been closed")
+            future = self.bot.loop.create_future()
+            future.set_result(None)
+            return future
+        entry = {
+            "id": self.next_id,
+            "destination": list(destination),
+            "content": content,
+            "embed": embed.to_dict() if embed is not None else None,
+            "edit": list(edit) if edit is not None else None,
+            "priority": int(priority),
+            "attempts": 0,
+        }
+        self.next_id += 1
+        self._write("put", **entry)
+        self.lanes[priority][entry["id"]] = entry
+        future = self.futures[entry["id"]] = self.bot.loop.create_future()
+        trace = tracing.current.get()
+        if trace is not None:
+            trace.hold()
+            self.traces[entry["id"]] = trace
+        self._publish("enqueue", entry)
+        self._wakeups[priority].set()
+        return future
+
+    def dead_letters(self) -> List[Dict[str, Any]]:
+        try:
+            with self.dead_path.open() as fp:
+                return [json.loads(line) for line in fp if line.strip()]
+        except FileNotFoundError:
+            return []
+
+    def retry_dead_letters(self) -> int:
+        """Move every dead letter back on to the end of the queue."""
+        entries = self.dead_letters()
+        for entry in entries:
+            entry.pop("error", None)
+            entry["id"] = self.next_id
+            entry["attempts"] = 0
+            self.next_id += 1
+            self._write("put", **entry)
+            self._lane(entry)[entry["id"]] = entry
+        self.clear_dead_letters()
+        self.wakeup()
+        return len(entries)
+
+    def clear_dead_letters(self) -> None:
+        self.dead_path.unlink(missing_ok=True)
+
+    def _resolve(self, entry: Dict[str, Any], message: Optional[discord.Message]) -> None:
+        future = self.futures.pop(entry["id"], None)
+        if future is not None and not future.done():
+            future.set_result(message)
+        trace = self.traces.pop(entry["id"], None)
+        if trace is not None:
+            trace.release()
+
+    def _ack(self, entry: Dict[str, Any]) -> None:
+        del self._lane(entry)[entry["id"]]
+        self._write("ack", id=entry["id"])
+        self.delivered += 1
+        if self.delivered >= COMPACT_AFTER:
+            self._journal.close()
+            self._compact()
+            self._journal = self.path.open("a")
+
+    def _dead_letter(self, entry: Dict[str, Any], error: Exception) -> None:
+        log.warning(f"Giving up on delivering outbox entry {entry['id']} after {entry['attempts']} attempts")
+        with self.dead_path.open("a") as fp:
+            fp.write(f'{json.dumps({**entry, "error": str(error)})}\n')
+        self._ack(entry)
+        self._resolve(entry, None)
+        self._publish("dead", entry)
+
+    def _publish(self, action: str, entry: Dict[str, Any]) -> None:
+        """Tell the dashboard what happened to an entry and how deep each lane is now."""
+        self.bot.events.publish(
+            "queue",
+            {
+                "action": action,
+                "id": entry["id"],
+                "lane": Priority(entry.get("priority", Priority.INFO)).name.lower(),
+                "depth": {priority.name.lower(): len(lane) for priority, lane in self.lanes.items()},
+            },
+            replay=False,  # only the current depth matters to someone who's just opened it
+        )
+
+    async def deliver(self, entry: Dict[str, Any]) -> Optional[discord.Message]:
+        if entry.get("edit") is not None:
+            channel_id, message_id = entry["edit"]
+            fields = {"embed": entry["embed"]}
+            if entry["content"] is not None:
+                fields["content"] = entry["content"]
+            try:
+                await self.bot.http.edit_message(channel_id, message_id, **fields)
+            except discord.NotFound:
+                pass
+            else:
+                return None
+
+        kind, id = entry["destination"]
+        destination = await self.bot.get_destination(kind, id)
+        if destination is None:
+            raise UndeliverableError(f"Could not find the {kind} with id {id}")
+        embed = discord.Embed.from_dict(entry["embed"]) if entry["embed"] is not None else None
+        return await destination.send(entry["content"], embed=embed)
+
+    async def _worker(self, priority: Priority) -> None:
+        lane = self.lanes[priority]
+        wakeup = self._wakeups[priority]
+        await self.bot.wait_until_ready()
+        backoff = 1
+        while True:
+            if not lane:
+                wakeup.clear()
+                await wakeup.wait()
+                continue
+
+            entry = next(iter(lane.values()))
+            tracing.current.set(self.traces.get(entry["id"]))
+            try:
+                with tracing.span("queue", lane=priority.name.lower()):
+                    await self.scheduler.acquire(priority)
+                with tracing.span("send", destination=entry["destination"][0], attempt=entry["attempts"] + 1):
+                    message = await self.deliver(entry)
+            except TRANSIENT_ERRORS as exc:
+                log.info(f"Discord is unreachable ({exc!r}), retrying the outbox in {backoff}s")
+                await self._sleep(wakeup, backoff)
+                backoff = min(backoff * 2, MAX_BACKOFF)
+                continue
+            except (discord.HTTPException, UndeliverableError) as exc:
+                if getattr(exc, "status", 0) >= 500:  # discord is having a bad day, this isn't the message's fault
+                    await self._sleep(wakeup, backoff)
+                    backoff = min(backoff * 2, MAX_BACKOFF)
+                    continue
+                entry["attempts"] += 1
+                self._write("fail", id=entry["id"], attempts=entry["attempts"])
+                if entry["attempts"] >= MAX_ATTEMPTS:
+                    self._dead_letter(entry, exc)
+                else:
+                    await self._sleep(wakeup, backoff)
+                    backoff = min(backoff * 2, MAX_BACKOFF)
+                continue
+            except Exception as exc:  # retrying a bug won't fix it, but one bad entry mustn't stop the whole lane
+                log.exception(f"Unexpected error delivering outbox entry {entry['id']}", exc_info=exc)
+                entry["attempts"] += 1
+                self._dead_letter(entry, exc)
+                continue
+
+            backoff = 1
+            self._ack(entry)
+            self._resolve(entry, message)
+            self._publish("deliver", entry)
+
+    @staticmethod
+    async def _sleep(wakeup: asyncio.Event, delay: float) -> None:
+        """Sleep for ``delay`` unless something calls :meth:`wakeup` first."""
+        wakeup.clear()
+        try:
+            await asyncio.wait_for(wakeup.wait(), timeout=delay)
+        except asyncio.TimeoutError:
+            pass
@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+
+import importlib.util
+from pathlib import Path
+from types import ModuleType
+from typing import List
+
+from .rules import RelayRules, RuleError
+
+# preferences that are only read while starting up so changing them needs a restart
+RESTART_REQUIRED = ("play_tf2", "lean_mode", "dashboard_port")
+
+
+class PreferencesError(Exception):
+    """Raised when the preferences file can't be loaded or has invalid values in it."""
+
+
+def load(path: Path, name: str = "config.preferences") -> ModuleType:
+    """Load a fresh copy of the preferences file without touching the one that's currently in use."""
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    try:
+        spec.loader.exec_module(module)
+    except Exception as exc:
+        raise PreferencesError(f"couldn't load {path.name}: {exc!r}") from exc
+    validate(module)
+    return module
+
+
+def validate(preferences: ModuleType) -> None:
+    errors: List[str] = []
+    for name in ("bots_steam_ids", "embed_colour", "channel_id", "owner_ids"):
+        if not hasattr(preferences, name):
+            errors.append(f"{name} is missing")
+    if errors:
+        raise PreferencesError(", ".join(errors))
+
+    bots = preferences.bots_steam_ids
+    if not isinstance(bots, dict) or not bots:
+        errors.append("bots_steam_ids needs to be a dict of at least one steam id to its files folder")
+    elif not all(isinstance(id64, int) and isinstance(folder, str) for id64, folder in bots.items()):
+        errors.append("bots_steam_ids needs to map 64 bit steam ids to the path of the bot's files folder")
+
+    colour = preferences.embed_colour
+    if not isinstance(colour, int) or not 0 <= colour <= 0xFFFFFF:
+        errors.append("embed_colour needs to be a hex colour like 0x2E3BAD")
+
+    channel_id = preferences.channel_id
+    if channel_id is not None and not isinstance(channel_id, int):
+        errors.append("channel_id needs to be a channel id or None")
+
+    owner_ids = preferences.owner_ids
+    if not isinstance(owner_ids, (list, tuple, set)) or not owner_ids:
+        errors.append("owner_ids needs to be a list of at least one user id")
+    elif not all(isinstance(owner_id, int) for owner_id in owner_ids):
+        errors.append("owner_ids can only contain user ids")
+
+    port = getattr(preferences, "dashboard_port", None)
+    if port is not None and (not isinstance(port, int) or not 0 < port < 65536):
+        errors.append("dashboard_port needs to be a port number or None")
+
+    rate = getattr(preferences, "trace_sample_rate", 0.1)
+    if isinstance(rate, bool) or not isinstance(rate, (int, float)) or not 0 <= rate <= 1:
+        errors.append("trace_sample_rate needs to be a number between 0 and 1")
+
+    threshold = getattr(preferences, "slow_command_threshold", 5)
+    if threshold is not None and (
+        isinstance(threshold, bool) or not isinstance(threshold, (int, float)) or threshold <= 0
+    ):
+        errors.append("slow_command_threshold needs to be a positive number of seconds or None")
+
+    if not isinstance(getattr(preferences, "native_trades", False), bool):
+        errors.append("native_trades needs to be True or False")
+
+    try:
+        RelayRules(getattr(preferences, "relay_rules", ()))
+    except RuleError as exc:
+        errors.append(str(exc))
+
+    if errors:
+        raise PreferencesError(", ".join(errors))
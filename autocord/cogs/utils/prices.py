@@ -0,0 +1,235 @@
+# -*- coding: utf-8 -*-
+
+import re
+import struct
+import time
+from array import array
+from bisect import bisect_left
+from collections import Counter
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from .storage import data_path
+
+KEY = "Mann Co. Supply Crate Key"
+METALS = {"Refined Metal": 1, "Reclaimed Metal": 1 / 3, "Scrap Metal": 1 / 9}
+SUMMARY = re.compile(r"Asked:\s*(?P<asked>.*?)\.?\s*Offered:\s*(?P<offered>.*?)\.?\s*$", re.DOTALL)
+# " and " only separates parts next to currency, item names like "Bread Box and Bonk" have it in them too
+SEPARATOR = re.compile(
+    r",\s*|\s+and\s+(?=\d+(?:\.\d+)?\s*(?:keys?|ref)\b)"
+    + "".join(rf"|(?<=\b{word})\s+and\s+" for word in ("key", "keys", "ref", "refined", "metal")),
+    re.IGNORECASE,
+)
+CURRENCY = re.compile(r"(?P<amount>\d+(?:\.\d+)?)\s*(?P<unit>keys?|ref(?:ined)?)", re.IGNORECASE)
+COUNTED = re.compile(r"(?:(?P<before>\d+)\s*x\s+)?(?P<name>.+?)(?:\s+x\s*(?P<after>\d+))?")
+RECORD = struct.Struct("<IdddB")  # name id, timestamp, keys, metal, sold
+
+
+class PricePoint(NamedTuple):
+    name: str
+    sold: bool
+    keys: float
+    metal: float
+
+
+# the non-currency items on one side of a trade, and how many keys and how much metal there was
+Side = Tuple[Counter, float, float]
+
+
+def count_side(items: Iterable[Tuple[Optional[str], int]]) -> Side:
+    """Split ``(name, count)`` pairs into a :data:`Side`, an item without a name is kept as ``None``."""
+    counted = Counter()
+    keys = metal = 0.0
+    for name, count in items:
+        if name == KEY:
+            keys += count
+        elif name in METALS:
+            metal += METALS[name] * count
+        else:
+            counted[name] += count
+    return counted, keys, metal
+
+
+def parse_side(text: str) -> Side:
+    """Split one side of a summary into the non-currency items, and how many keys and how much metal there was."""
+    counted = []
+    keys = metal = 0.0
+    for part in SEPARATOR.split(text.strip()):
+        part = part.strip().strip("()")
+        if not part or part == "nothing":
+            continue
+        currency = CURRENCY.fullmatch(part)
+        if currency is not None:
+            if currency["unit"].lower().startswith("key"):
+                keys += float(currency["amount"])
+            else:
+                metal += float(currency["amount"])
+            continue
+        match = COUNTED.fullmatch(part)
+        counted.append((match["name"], int(match["before"] or match["after"] or 1)))
+    items, item_keys, item_metal = count_side(counted)
+    return items, keys + item_keys, metal + item_metal
+
+
+def parse_sides(content: str) -> Optional[Tuple[Side, Side]]:
+    """The asked and offered sides of a trade's summary."""
+    match = SUMMARY.search(content)
+    if match is None:
+        return None
+    return parse_side(match["asked"]), parse_side(match["offered"])
+
+
+def totals(asked: Side, offered: Side) -> Tuple[float, float, float, float]:
+    """The keys and metal that came in and went out in a trade, as ``(keys in, keys out, metal in, metal out)``."""
+    _, asked_keys, asked_metal = asked
+    _, offered_keys, offered_metal = offered
+    return asked_keys, offered_keys, round(asked_metal, 2), round(offered_metal, 2)
+
+
+def price_point(asked: Side, offered: Side) -> Optional[PricePoint]:
+    """Get the price a single item was traded at.
+
+    Only trades of one kind of item for pure currency have an unambiguous price, anything else returns ``None``.
+    """
+    asked, asked_keys, asked_metal = asked
+    offered, offered_keys, offered_metal = offered
+    if None in asked or None in offered:  # we don't know what some of it was
+        return None
+    if len(offered) == 1 and not asked:  # we gave an item for currency
+        (name, count), = offered.items()
+        return PricePoint(name, True, asked_keys / count, round(asked_metal / count, 2))
+    if len(asked) == 1 and not offered:  # we bought an item with currency
+        (name, count), = asked.items()
+        return PricePoint(name, False, offered_keys / count, round(offered_metal / count, 2))
+    if not asked and not offered and (asked_keys or offered_keys) and not (asked_keys and offered_keys):
+        # a key traded for metal prices the key itself
+        if offered_keys:
+            return PricePoint(KEY, True, 0, round(asked_metal / offered_keys, 2))
+        return PricePoint(KEY, False, 0, round(offered_metal / asked_keys, 2))
+    return None
+
+
+class Series:
+    """Append-only parallel arrays of the prices one item was bought or sold at."""
+
+    __slots__ = ("timestamps", "keys", "metal")
+
+    def __init__(self):
+        self.timestamps = array("d")
+        self.keys = array("d")
+        self.metal = array("d")
+
+    def append(self, timestamp: float, keys: float, metal: float) -> None:
+        self.timestamps.append(timestamp)
+        self.keys.append(keys)
+        self.metal.append(metal)
+
+
+def percentile(ordered: List[float], percent: float) -> float:
+    """The linearly interpolated percentile of an already sorted list."""
+    if len(ordered) == 1:
+        return ordered[0]
+    position = (len(ordered) - 1) * percent / 100
+    lower = int(position)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+
+class PriceStats(NamedTuple):
+    count: int
+    prices: Dict[str, Tuple[float, float]]  # the (keys, metal) of the trade at each percentile
+    key_price: Optional[float]  # the metal a key was valued at to order them
+
+
+PERCENTILES = {"min": 0, "p10": 10, "median": 50, "p90": 90, "max": 100}
+KEY_TRADES = 50  # the number of recent key for metal trades the key price comes from
+
+
+class PriceHistory:
+    """A compact per-item time series of the prices our trades went through at.
+
+    Points are appended to a fixed width binary file with the item names interned in a
+    separate file, so loading it is a single read and nothing has to be re-parsed.
+    """
+
+    def __init__(self, name: str = "prices"):
+        self.path = data_path(f"{name}.bin")
+        self.names_path = data_path(f"{name}-names.txt")
+        try:
+            self.names: List[str] = self.names_path.read_text(encoding="utf-8").splitlines()
+        except FileNotFoundError:
+            self.names = []
+        self.ids: Dict[str, int] = {name: id for id, name in enumerate(self.names)}
+        self.series: Dict[Tuple[int, bool], Series] = {}
+        try:
+            data = self.path.read_bytes()
+        except FileNotFoundError:
+            data = b""
+        data = data[: len(data) - len(data) % RECORD.size]  # drop a record cut off by a crash
+        for id, timestamp, keys, metal, sold in RECORD.iter_unpack(data):
+            self._series(id, bool(sold)).append(timestamp, keys, metal)
+
+    def _series(self, id: int, sold: bool) -> Series:
+        try:
+            return self.series[id, sold]
+        except KeyError:
+            series = self.series[id, sold] = Series()
+            return series
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.ids
+
+    def add(self, point: PricePoint, timestamp: Optional[float] = None) -> None:
+        timestamp = time.time() if timestamp is None else timestamp
+        try:
+            id = self.ids[point.name]
+        except KeyError:
+            id = self.ids[point.name] = len(self.names)
+            self.names.append(point.name)
+            with self.names_path.open("a", encoding="utf-8") as fp:
+                fp.write(f"{point.name}\n")
+        self._series(id, point.sold).append(timestamp, point.keys, point.metal)
+        with self.path.open("ab") as fp:
+            fp.write(RECORD.pack(id, timestamp, point.keys, point.metal, point.sold))
+
+    def search(self, name: str) -> Optional[str]:
+        """The name of the tracked item that best matches ``name``, ignoring case."""
+        if name in self.ids:
+            return name
+        lowered = name.lower()
+        matches = [known for known in self.names if lowered in known.lower()]
+        return min(matches, key=len) if matches else None
+
+    def key_price(self) -> Optional[float]:
+        """The median metal our recent trades of keys for metal went through at, if we've made any."""
+        id = self.ids.get(KEY)
+        metal = sorted(
+            price
+            for sold in (True, False)
+            if (id, sold) in self.series
+            for price in self.series[id, sold].metal[-KEY_TRADES:]
+        )
+        return percentile(metal, 50) if metal else None
+
+    def stats(self, name: str, since: Optional[float] = None, *, sold: bool) -> Optional[PriceStats]:
+        """The prices of the trades at each of :data:`PERCENTILES`.
+
+        Trades are ordered by their value in metal with keys at :meth:`key_price`, and each percentile is one
+        trade's whole price so the keys and metal shown always went through together.
+        """
+        series = self.series.get((self.ids.get(name), sold))
+        if series is None:
+            return None
+        start = bisect_left(series.timestamps, since) if since is not None else 0
+        prices = list(zip(series.keys[start:], series.metal[start:]))
+        if not prices:
+            return None
+        key_price = self.key_price()
+        if key_price is not None:
+            prices.sort(key=lambda price: price[0] * key_price + price[1])
+        else:  # more keys is always worth more, it's only how much metal a key is worth we don't know
+            prices.sort()
+        return PriceStats(
+            len(prices),
+            {label: prices[round((len(prices) - 1) * percent / 100)] for label, percent in PERCENTILES.items()},
+            key_price,
+        )
@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+
+import sys
+import threading
+import time
+from collections import Counter
+from types import FrameType
+from typing import Dict, List, Optional, Tuple
+
+INTERVAL = 0.005  # seconds between samples
+MAX_DEPTH = 100
+
+
+def frame_name(frame: FrameType) -> str:
+    code = frame.f_code
+    filename = code.co_filename.rsplit("site-packages", 1)[-1].lstrip("/\\")
+    return f"{code.co_name} ({filename}:{code.co_firstlineno})"
+
+
+class Sampler(threading.Thread):
+    """A stack sampler that runs in its own thread, looking at what every other thread is doing every
+    :data:`INTERVAL` seconds.
+
+    The stacks are kept collapsed, ``thread;outer;...;inner`` to the number of times they were seen, which
+    is the format flamegraph.pl and speedscope read.
+    """
+
+    def __init__(self, loop_thread: Optional[int] = None, interval: float = INTERVAL):
+        super().__init__(name="autocord-sampler", daemon=True)
+        self.loop_thread = loop_thread or threading.get_ident()
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self.elapsed = 0.0
+        self.finished = threading.Event()
+
+    def run(self) -> None:
+        start = time.perf_counter()
+        while not self.finished.wait(self.interval):
+            self.sample()
+        self.elapsed = time.perf_counter() - start
+
+    def thread_names(self) -> Dict[int, str]:
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        names[self.loop_thread] = "event-loop"
+        return names
+
+    def sample(self) -> None:
+        names = self.thread_names()
+        for ident, frame in sys._current_frames().items():
+            if ident == self.ident:
+                continue
+            stack: List[str] = []
+            while frame is not None and len(stack) < MAX_DEPTH:
+                stack.append(frame_name(frame))
+                frame = frame.f_back
+            stack.append(names.get(ident, f"thread-{ident}"))
+            self.stacks[";".join(reversed(stack))] += 1
+        self.samples += 1
+
+    def collapsed(self) -> str:
+        return "\n".join(f"{stack} {count}" for stack, count in self.stacks.most_common())
+
+    def top(self, n: int = 10) -> Tuple[List[Tuple[str, int]], List[Tuple[str, int]]]:
+        """The ``n`` functions seen most often at the top of a stack (own time) and anywhere in one
+        (total time), as (name, samples) pairs.
+
+        Both are counted per thread, every thread is sampled once a sample so a function's count out of
+        :attr:`samples` is the share of that thread's time and never more than all of it.
+        """
+        own: Counter = Counter()
+        total: Counter = Counter()
+        for stack, count in self.stacks.items():
+            thread, *frames = stack.split(";")
+            if not frames:
+                continue
+            own[f"{frames[-1]} [{thread}]"] += count
+            for frame in set(frames):
+                total[f"{frame} [{thread}]"] += count
+        return own.most_common(n), total.most_common(n)
@@ -0,0 +1,117 @@
+# -*- coding: utf-8 -*-
+
+from datetime import date, timedelta
+from typing import Dict, Iterable, List, Tuple
+
+from .storage import data_path, dump_json, load_json
+
+MAX_DAYS = 400  # aggregates older than this are dropped when checkpointing
+
+
+class Aggregate:
+    """The running totals of a group of trades."""
+
+    __slots__ = ("trades", "keys_in", "keys_out", "metal_in", "metal_out")
+
+    def __init__(
+        self, trades: int = 0, keys_in: float = 0, keys_out: float = 0, metal_in: float = 0, metal_out: float = 0,
+    ):
+        self.trades = trades
+        self.keys_in = keys_in
+        self.keys_out = keys_out
+        self.metal_in = metal_in
+        self.metal_out = metal_out
+
+    def add(self, keys_in: float, keys_out: float, metal_in: float, metal_out: float) -> None:
+        self.trades += 1
+        self.keys_in += keys_in
+        self.keys_out += keys_out
+        self.metal_in += metal_in
+        self.metal_out += metal_out
+
+    def __iadd__(self, other: "Aggregate") -> "Aggregate":
+        self.trades += other.trades
+        self.keys_in += other.keys_in
+        self.keys_out += other.keys_out
+        self.metal_in += other.metal_in
+        self.metal_out += other.metal_out
+        return self
+
+    @property
+    def net_keys(self) -> float:
+        return self.keys_in - self.keys_out
+
+    @property
+    def net_metal(self) -> float:
+        return self.metal_in - self.metal_out
+
+    def to_list(self) -> List[float]:
+        return [self.trades, self.keys_in, self.keys_out, self.metal_in, self.metal_out]
+
+
+class Profits:
+    """Trade count and currency totals per bot per day and per trader per day.
+
+    Each trade updates two aggregates in place, so answering a question about a period only adds up
+    the daily aggregates in it rather than going back over the trades themselves.
+    """
+
+    def __init__(self, name: str = "profit"):
+        self.path = data_path(f"{name}.json")
+        data = load_json(self.path, default={"bots": [], "traders": []})
+        self.bots: Dict[Tuple[int, int], Aggregate] = {
+            (day, id64): Aggregate(*totals) for day, id64, *totals in data["bots"]
+        }
+        self.traders: Dict[Tuple[int, int], Aggregate] = {
+            (day, id64): Aggregate(*totals) for day, id64, *totals in data["traders"]
+        }
+        self.changed = False
+
+    def add(self, bot_id64: int, trader_id64: int, totals: Tuple[float, float, float, float], day: date = None) -> None:
+        day = (day or date.today()).toordinal()
+        for aggregates, key in ((self.bots, (day, bot_id64)), (self.traders, (day, trader_id64))):
+            try:
+                aggregate = aggregates[key]
+            except KeyError:
+                aggregate = aggregates[key] = Aggregate()
+            aggregate.add(*totals)
+        self.changed = True
+
+    @staticmethod
+    def _sum(aggregates: Dict[Tuple[int, int], Aggregate], days: Iterable[int]) -> Dict[int, Aggregate]:
+        days = set(days)
+        totals: Dict[int, Aggregate] = {}
+        for (day, id64), aggregate in aggregates.items():
+            if day in days:
+                try:
+                    totals[id64] += aggregate
+                except KeyError:
+                    totals[id64] = Aggregate(*aggregate.to_list())
+        return totals
+
+    @staticmethod
+    def days(period: int, end: date = None) -> range:
+        end = (end or date.today()).toordinal()
+        return range(end - period + 1, end + 1)
+
+    def by_bot(self, days: Iterable[int]) -> Dict[int, Aggregate]:
+        return self._sum(self.bots, days)
+
+    def by_trader(self, days: Iterable[int]) -> Dict[int, Aggregate]:
+        return self._sum(self.traders, days)
+
+    def checkpoint(self) -> None:
+        if not self.changed:
+            return
+        oldest = (date.today() - timedelta(days=MAX_DAYS)).toordinal()
+        for aggregates in (self.bots, self.traders):
+            for key in [key for key in aggregates if key[0] < oldest]:
+                del aggregates[key]
+        dump_json(
+            self.path,
+            {
+                "bots": [[day, id64, *aggregate.to_list()] for (day, id64), aggregate in self.bots.items()],
+                "traders": [[day, id64, *aggregate.to_list()] for (day, id64), aggregate in self.traders.items()],
+            },
+        )
+        self.changed = False
@@ -0,0 +1,187 @@
+# -*- coding: utf-8 -*-
+
+import re
+from collections import deque
+from typing import Any, Dict, FrozenSet, Iterable, List, NamedTuple, Optional, Pattern, Set, Tuple
+
+KINDS = ("trade", "review", "message")
+ACTIONS = ("mute", "route", "alert")
+
+
+class RuleError(Exception):
+    """Raised when one of the relay rules in the preferences isn't valid."""
+
+    def __init__(self, index: int, message: str):
+        self.index = index
+        super().__init__(f"relay rule {index + 1} {message}")
+
+
+class Rule(NamedTuple):
+    action: str
+    kinds: FrozenSet[str]
+    channel_id: Optional[int]
+
+
+class Verdict(NamedTuple):
+    """What the rules that matched a message want done with it."""
+
+    mute: bool
+    channel_ids: Tuple[int, ...]
+    alert: bool
+    alerts: Tuple[str, ...]  # the keywords or pattern matches that should ping the owners
+
+    def destinations(self, default: List[Tuple[str, int]]) -> List[Tuple[str, int]]:
+        if self.mute:
+            return []
+        if self.channel_ids:
+            return [("channel", channel_id) for channel_id in self.channel_ids]
+        return default
+
+
+NOTHING = Verdict(False, (), False, ())
+
+
+class AhoCorasick:
+    """Finds every keyword in a piece of text in one pass, however many keywords there are.
+
+    The keywords are built into a trie with failure links, so the cost of a search only depends on the
+    length of the text and the number of matches.
+    """
+
+    def __init__(self, keywords: Dict[str, Iterable[int]]):
+        self.goto: List[Dict[str, int]] = [{}]
+        self.fail: List[int] = [0]
+        outputs: List[Set[Tuple[int, str]]] = [set()]
+        for keyword, ids in keywords.items():
+            state = 0
+            for char in keyword:
+                next_state = self.goto[state].get(char)
+                if next_state is None:
+                    next_state = self.goto[state][char] = len(self.goto)
+                    self.goto.append({})
+                    self.fail.append(0)
+                    outputs.append(set())
+                state = next_state
+            outputs[state].update((id, keyword) for id in ids)
+
+        queue = deque(self.goto[0].values())  # the root's children fail back to the root
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self.goto[state].items():
+                queue.append(next_state)
+                fail = self.fail[state]
+                while fail and char not in self.goto[fail]:
+                    fail = self.fail[fail]
+                self.fail[next_state] = self.goto[fail].get(char, 0)
+                outputs[next_state] |= outputs[self.fail[next_state]]
+        self.outputs = [frozenset(output) for output in outputs]
+
+    def __len__(self) -> int:
+        return len(self.goto)
+
+    def search(self, text: str) -> Set[Tuple[int, str]]:
+        """The (id, keyword) pairs of every keyword in ``text``."""
+        goto, fail, outputs = self.goto, self.fail, self.outputs
+        found: Set[Tuple[int, str]] = set()
+        state = 0
+        for char in text:
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            if outputs[state]:
+                found |= outputs[state]
+        return found
+
+
+def parse_rule(index: int, raw: Any) -> Tuple[Rule, List[str], Optional[Pattern]]:
+    if not isinstance(raw, dict):
+        raise RuleError(index, "needs to be a dict")
+    action = raw.get("action")
+    if action not in ACTIONS:
+        raise RuleError(index, f"needs an action of {', '.join(ACTIONS)}")
+
+    kinds = raw.get("kinds", KINDS)
+    if isinstance(kinds, str):
+        kinds = (kinds,)
+    unknown = set(kinds) - set(KINDS)
+    if unknown:
+        raise RuleError(index, f"has unknown kinds {', '.join(map(str, unknown))}, they can be {', '.join(KINDS)}")
+
+    channel_id = raw.get("channel_id")
+    if action == "route" and not isinstance(channel_id, int):
+        raise RuleError(index, "routes messages so it needs a channel_id")
+
+    keywords = raw.get("keywords", [])
+    if isinstance(keywords, str):
+        keywords = [keywords]
+    if not all(isinstance(keyword, str) and keyword for keyword in keywords):
+        raise RuleError(index, "can only have non-empty strings as keywords")
+
+    pattern = raw.get("pattern")
+    if pattern is not None:
+        try:
+            pattern = re.compile(pattern, re.IGNORECASE)
+        except (re.error, TypeError) as exc:
+            raise RuleError(index, f"has an invalid pattern: {exc}") from None
+    return Rule(action, frozenset(kinds), channel_id), keywords, pattern
+
+
+class RelayRules:
+    """Decides whether messages from the bots are muted, routed somewhere else or should ping the owners.
+
+    Every keyword from every rule goes into one :class:`AhoCorasick` matcher, so a message is only scanned
+    once for them however many there are. Patterns are searched for one at a time, combining them would
+    miss a rule whenever another rule's match overlapped it. Rules with neither apply to every message of
+    their kinds.
+    """
+
+    def __init__(self, raw_rules: Iterable[Any] = ()):
+        self.rules: List[Rule] = []
+        self.always: Set[int] = set()
+        keywords: Dict[str, Set[int]] = {}
+        self.names: Dict[str, str] = {}  # the keywords are matched case insensitively but shown as written
+        self.patterns: List[Tuple[int, Pattern]] = []
+        for index, raw in enumerate(raw_rules):
+            rule, rule_keywords, pattern = parse_rule(index, raw)
+            self.rules.append(rule)
+            for keyword in rule_keywords:
+                keywords.setdefault(keyword.casefold(), set()).add(index)
+                self.names.setdefault(keyword.casefold(), keyword)
+            if pattern is not None:
+                self.patterns.append((index, pattern))
+            if not rule_keywords and pattern is None:
+                self.always.add(index)
+        self.keywords = AhoCorasick(keywords) if keywords else None
+
+    def __len__(self) -> int:
+        return len(self.rules)
+
+    def match(self, kind: str, content: str) -> Verdict:
+        if not self.rules:
+            return NOTHING
+        matches: Set[Tuple[int, str]] = {(index, "") for index in self.always}
+        if self.keywords is not None:
+            matches |= self.keywords.search(content.casefold())
+        for index, pattern in self.patterns:
+            match = pattern.search(content)
+            if match is not None:
+                matches.add((index, match.group()))
+
+        mute = alert = False
+        channel_ids: List[int] = []
+        alerts: List[str] = []
+        for index, matched in sorted(matches):
+            rule = self.rules[index]
+            if kind not in rule.kinds:
+                continue
+            if rule.action == "mute":
+                mute = True
+            elif rule.action == "route":
+                if rule.channel_id not in channel_ids:
+                    channel_ids.append(rule.channel_id)
+            else:
+                alert = True
+                label = self.names.get(matched, matched)
+                if label and label not in alerts:
+                    alerts.append(label)
+        return Verdict(mute, tuple(channel_ids), alert, tuple(alerts))
@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+
+import asyncio
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from enum import IntEnum
+from itertools import cycle
+from typing import AsyncIterator, Deque, Dict, Optional
+
+
+class Priority(IntEnum):
+    REVIEW = 0  # offers waiting for an owner to look at them
+    TRADE = 1
+    INFO = 2  # other relayed messages and digests
+    COMMAND = 3  # replies to commands
+
+
+# how many turns each priority gets in every round when they are all waiting, so nothing starves
+WEIGHTS = {Priority.REVIEW: 8, Priority.TRADE: 4, Priority.INFO: 2, Priority.COMMAND: 1}
+
+
+class Scheduler:
+    """Shares one rate limit budget between all outgoing Discord messages by priority.
+
+    Senders wait for a slot with :meth:`slot`. While there is budget to spare slots are handed out
+    straight away, once it runs out waiters are woken by a weighted round robin over the priorities,
+    so urgent messages go first without less urgent ones waiting forever.
+    """
+
+    def __init__(self, rate: int = 5, per: float = 5.0):
+        self.rate = rate
+        self.per = per
+        self.tokens = float(rate)
+        self.updated = time.monotonic()
+        self.waiters: Dict[Priority, Deque[asyncio.Future]] = {priority: deque() for priority in Priority}
+        self.order = cycle([priority for priority, weight in WEIGHTS.items() for _ in range(weight)])
+        self.sent: Dict[Priority, int] = {priority: 0 for priority in Priority}
+        self._dispatcher: Optional[asyncio.Task] = None
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.rate, self.tokens + (now - self.updated) * self.rate / self.per)
+        self.updated = now
+
+    def waiting(self) -> Dict[Priority, int]:
+        return {priority: len(waiters) for priority, waiters in self.waiters.items()}
+
+    async def acquire(self, priority: Priority) -> None:
+        self._refill()
+        if self.tokens >= 1 and not any(self.waiters.values()):
+            self.tokens -= 1
+            self.sent[priority] += 1
+            return
+
+        future = asyncio.get_event_loop().create_future()
+        self.waiters[priority].append(future)
+        if self._dispatcher is None or self._dispatcher.done():
+            self._dispatcher = asyncio.get_event_loop().create_task(self._dispatch())
+        await future
+
+    @asynccontextmanager
+    async def slot(self, priority: Priority) -> AsyncIterator[None]:
+        await self.acquire(priority)
+        yield
+
+    def _next(self) -> Optional[asyncio.Future]:
+        if not any(self.waiters.values()):
+            return None
+        while True:
+            priority = next(self.order)
+            waiters = self.waiters[priority]
+            while waiters:
+                future = waiters.popleft()
+                if not future.cancelled():
+                    self.sent[priority] += 1
+                    return future
+            if not any(self.waiters.values()):  # everything left had been cancelled
+                return None
+
+    async def _dispatch(self) -> None:
+        while True:
+            self._refill()
+            if self.tokens < 1:
+                await asyncio.sleep((1 - self.tokens) * self.per / self.rate)
+                continue
+            future = self._next()
+            if future is None:
+                return
+            self.tokens -= 1
+            future.set_result(None)
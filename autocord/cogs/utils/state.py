@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Iterator, NamedTuple, Optional
+
+import steam
+
+from .storage import data_path, dump_json, load_json
+
+log = logging.getLogger(__name__)
+
+VERSION = 1
+PROFILE_TTL = 24 * 60 * 60  # trader profiles older than this are fetched again
+MAX_PROFILES = 1000
+
+
+class Profile(NamedTuple):
+    """The bits of a trader's Steam profile we show in embeds, small enough to keep between restarts."""
+
+    id64: int
+    name: str
+    avatar_url: str
+    community_url: str
+    fetched: float
+
+    def __str__(self) -> str:
+        return self.name
+
+    @property
+    def fresh(self) -> bool:
+        return time.time() - self.fetched < PROFILE_TTL
+
+    @classmethod
+    def from_user(cls, user: steam.User) -> "Profile":
+        return cls(user.id64, user.name, user.avatar_url, user.community_url, time.time())
+
+    @classmethod
+    def from_steam_id(cls, steam_id: steam.SteamID) -> "Profile":
+        return cls(steam_id.id64, str(steam_id.id64), "", steam_id.community_url, 0)
+
+
+class Profiles:
+    """A bounded LRU map of steam ids to the profiles of the people the bots have traded with."""
+
+    def __init__(self, max_size: int = MAX_PROFILES):
+        self.max_size = max_size
+        self.profiles: "OrderedDict[int, Profile]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self.profiles)
+
+    def __iter__(self) -> Iterator[Profile]:
+        return iter(self.profiles.values())
+
+    def get(self, id64: int) -> Optional[Profile]:
+        try:
+            self.profiles.move_to_end(id64)
+        except KeyError:
+            return None
+        return self.profiles[id64]
+
+    def __setitem__(self, id64: int, profile: Profile) -> None:
+        self.profiles[id64] = profile
+        self.profiles.move_to_end(id64)
+        while len(self.profiles) > self.max_size:
+            self.profiles.popitem(last=False)
+
+
+def save(state: Dict[str, Any]) -> None:
+    dump_json(data_path("state.json"), {"version": VERSION, "saved": time.time(), **state})
+
+
+def load() -> Optional[Dict[str, Any]]:
+    """The last saved state, or ``None`` if there isn't one this version of the bot understands."""
+    state = load_json(data_path("state.json"))
+    if state is None:
+        return None
+    if state.get("version") != VERSION:
+        log.info(f"Ignoring a state snapshot from version {state.get('version')}, expected {VERSION}")
+        return None
+    return state
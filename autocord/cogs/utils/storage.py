@@ -0,0 +1,29 @@
+# -*- coding: utf-8 -*-
+
+import json
+from pathlib import Path
+from typing import Any
+
+DATA = Path("data")
+
+
+def data_path(name: str) -> Path:
+    """The path to a file in the bot's data folder, creating the folder if needed."""
+    DATA.mkdir(exist_ok=True)
+    return DATA / name
+
+
+def load_json(path: Path, default: Any = None) -> Any:
+    try:
+        with path.open() as fp:
+            return json.load(fp)
+    except (OSError, ValueError):
+        return default
+
+
+def dump_json(path: Path, data: Any) -> None:
+    """Write ``data`` to ``path`` through a temporary file so a crash never leaves it half written."""
+    tmp = path.with_name(f"{path.name}.tmp")
+    with tmp.open("w") as fp:
+        json.dump(data, fp, separators=(",", ":"))
+    tmp.replace(path)
@@ -0,0 +1,160 @@
+# -*- coding: utf-8 -*-
+
+import asyncio
+import logging
+import random
+import time
+from collections import deque
+from typing import TYPE_CHECKING, Any, Deque, Optional
+
+import steam
+
+from .formats import format_error
+from .scheduler import Priority
+
+if TYPE_CHECKING:
+    from ... import AutoCord
+
+log = logging.getLogger(__name__)
+
+BASE_DELAY = 2
+MAX_DELAY = 10 * 60
+ALERT_AFTER = 3  # consecutive failures before the owners are told
+# retrying these would just fail the same way or get the account locked
+FATAL_ERRORS = (steam.InvalidCredentials,)
+
+
+class SteamSupervisor:
+    """Keeps the Steam client running, restarting it with exponential backoff and jitter if it stops.
+
+    The same client is restarted, it's closed and cleared first which is how steamio expects a client to be
+    reused, so the new session doesn't inherit the last one's websocket, cookies or caches.
+
+    steamio retries a dropped connection every 5s by itself without :meth:`steam.Client.start` ever returning, so
+    failures are counted from its disconnects too. After :data:`ALERT_AFTER` of them without the client getting
+    ready the owners are told and the client is restarted here instead, so the backoff applies during an outage.
+
+    It also keeps track of how long each reconnect took and how long the relay has been down
+    for so its availability can be reported.
+    """
+
+    def __init__(self, bot: "AutoCord"):
+        self.bot = bot
+        self.client = bot.client
+        self.failures = 0
+        self.restarts = 0
+        self.connected = False
+        self.reconnects: Deque[float] = deque(maxlen=50)
+        self.downtime = 0.0
+        self.down_since: Optional[float] = time.monotonic()  # we aren't up until the first on_ready
+        self.started = time.monotonic()
+        self.fatal: Optional[BaseException] = None
+        self._task: Optional[asyncio.Task] = None
+        self._client_task: Optional[asyncio.Task] = None
+
+    @property
+    def up(self) -> bool:
+        return self.down_since is None
+
+    @property
+    def availability(self) -> float:
+        """The fraction of the time since starting that the Steam client has been connected."""
+        elapsed = time.monotonic() - self.started
+        down = self.downtime + (time.monotonic() - self.down_since if self.down_since is not None else 0)
+        return 1 - down / elapsed if elapsed else 0
+
+    def mark_up(self) -> None:
+        if self.down_since is None:
+            return
+        duration = time.monotonic() - self.down_since
+        self.downtime += duration
+        if self.connected:  # the first login isn't a reconnect
+            self.reconnects.append(duration)
+            log.info(f"Reconnected to Steam after {duration:.2f}s")
+        self.connected = True
+        self.down_since = None
+        self.failures = 0
+
+    def went_down(self) -> None:
+        if self.down_since is None:
+            self.down_since = time.monotonic()
+
+    async def mark_down(self, error: Optional[BaseException] = None) -> None:
+        """Count a failure to connect, the owners are told when there have been enough in a row."""
+        self.went_down()
+        self.failures += 1
+        if self.failures == ALERT_AFTER:
+            reason = f"```py\n{format_error(error)}```" if error is not None else ""
+            await self.alert(
+                f"The Steam client has failed to stay connected {self.failures} times in a row,"
+                f" trades won't be relayed until it reconnects.{reason}"
+            )
+
+    async def disconnected(self) -> None:
+        """Count one of steamio's disconnects, giving up on its retries once there have been too many."""
+        if self.bot.is_closed() or self.client.is_closed():
+            return
+        await self.mark_down()
+        if self.failures >= ALERT_AFTER and self._client_task is not None:
+            log.info(f"Giving up on reconnecting after {self.failures} disconnects, restarting the Steam client")
+            self._client_task.cancel()
+
+    def start(self, **login: Any) -> None:
+        self._task = self.bot.loop.create_task(self.run(**login))
+
+    def cancel(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+
+    async def reset(self) -> None:
+        """Tidy up after the client stopped so it can be started again."""
+        try:
+            await self.client.close()
+        except Exception as exc:  # logging out needs the connection that probably just broke
+            log.debug("Couldn't close the Steam client cleanly", exc_info=exc)
+        session = self.client.http._session  # close() gives up before closing this if logging out fails
+        if session is not None and not session.closed:
+            await session.close()
+        self.client.clear()
+        await self.client.http._session.close()  # clear() opens a new one but logging in makes its own
+
+    async def run(self, **login: Any) -> None:
+        while not self.bot.is_closed():
+            if self.restarts:
+                await self.reset()
+            self._client_task = self.bot.loop.create_task(self.client.start(**login))
+            try:
+                await asyncio.wait((self._client_task,))
+            except asyncio.CancelledError:
+                self._client_task.cancel()
+                raise
+            try:
+                self._client_task.result()
+            except asyncio.CancelledError:  # disconnected() gave up on it and has already counted the failures
+                pass
+            except FATAL_ERRORS as exc:
+                self.went_down()
+                self.fatal = exc
+                log.error("Logging in to Steam failed and can't be retried", exc_info=exc)
+                await self.alert(
+                    "Logging in to Steam failed and won't be retried until the bot is restarted:\n"
+                    f"```py\n{format_error(exc)}```"
+                )
+                return
+            except Exception as exc:
+                log.warning("The Steam client stopped", exc_info=exc)
+                await self.mark_down(exc)
+            else:
+                if self.bot.is_closed():
+                    return
+                await self.mark_down()
+
+            self.restarts += 1
+            delay = min(MAX_DELAY, BASE_DELAY * 2 ** (self.failures - 1))
+            delay = delay / 2 + random.uniform(0, delay / 2)  # jitter so we don't retry in lockstep with anything
+            log.info(f"Restarting the Steam client in {delay:.1f}s (failure {self.failures})")
+            await asyncio.sleep(delay)
+
+    async def alert(self, message: str) -> None:
+        owners = " ".join(f"<@{owner_id}>" for owner_id in self.bot.owner_ids)
+        await self.bot.client.send(f"{owners} {message}", priority=Priority.REVIEW)
@@ -0,0 +1,128 @@
+# -*- coding: utf-8 -*-
+
+import logging
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Deque, Dict, Iterator, List, NamedTuple, Optional
+
+from discord.ext import commands
+
+from .prices import percentile
+
+log = logging.getLogger(__name__)
+
+WAITS = ("steam", "discord", "user")
+
+
+class Invocation(NamedTuple):
+    timestamp: float
+    wall: float
+    steam: float
+    discord: float
+    user: float
+    failed: bool
+
+    @property
+    def active(self) -> float:
+        """How long the command took without the time it spent waiting for the user to reply."""
+        return self.wall - self.user
+
+
+class Timing:
+    """The time a command that's still running has spent so far, and what it was waiting on."""
+
+    __slots__ = ("name", "timestamp", "start", "waits")
+
+    def __init__(self, name: str):
+        self.name = name
+        self.timestamp = time.time()
+        self.start = time.perf_counter()
+        self.waits = dict.fromkeys(WAITS, 0.0)
+
+
+current: ContextVar[Optional[Timing]] = ContextVar("timing", default=None)
+
+
+@contextmanager
+def waiting(on: str) -> Iterator[None]:
+    """Count the time spent in this block towards what the running command waited on ``on`` for."""
+    timing = current.get()
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        if timing is not None:
+            timing.waits[on] += time.perf_counter() - start
+
+
+class Summary(NamedTuple):
+    count: int
+    failed: int
+    p50: float
+    p95: float
+    p99: float
+    steam: float  # the fraction of the total active time that was spent waiting on them
+    discord: float
+    user: float  # the total seconds spent waiting for the user, not counted in the rest
+
+
+class CommandTelemetry:
+    """How long the last :attr:`size` invocations of each command took, recorded by the bot's invoke hooks.
+
+    The hooks run in the same task as the command, so anything it awaits inside :func:`waiting` is counted
+    towards its invocation without having to pass anything around. Time spent waiting for the user to reply is
+    kept out of the percentiles and the slow check, someone taking a minute to answer isn't the command being slow.
+    """
+
+    def __init__(self, slow_after: float = 5, size: int = 100):
+        self.slow_after = slow_after
+        self.size = size
+        self.invocations: Dict[str, Deque[Invocation]] = {}
+
+    async def before_invoke(self, ctx: commands.Context) -> None:
+        current.set(Timing(ctx.command.qualified_name))
+
+    async def after_invoke(self, ctx: commands.Context) -> None:
+        timing = current.get()
+        if timing is None:
+            return
+        current.set(None)
+        wall = time.perf_counter() - timing.start
+        invocation = Invocation(timing.timestamp, wall, *(timing.waits[on] for on in WAITS), ctx.command_failed)
+        try:
+            invocations = self.invocations[timing.name]
+        except KeyError:
+            invocations = self.invocations[timing.name] = deque(maxlen=self.size)
+        invocations.append(invocation)
+
+        if self.slow_after is not None and invocation.active > self.slow_after:
+            arguments = [repr(arg) for arg in ctx.args if not isinstance(arg, (commands.Cog, commands.Context))]
+            arguments.extend(f"{name}={value!r}" for name, value in ctx.kwargs.items())
+            log.warning(
+                f"{timing.name} took {invocation.active:.2f}s ({invocation.steam:.2f}s on Steam,"
+                f" {invocation.discord:.2f}s on Discord, {invocation.user:.2f}s more waiting for them to reply)"
+                f" for {ctx.author} with ({', '.join(arguments)})"
+            )
+
+    def summary(self, name: str) -> Optional[Summary]:
+        invocations = self.invocations.get(name)
+        if not invocations:
+            return None
+        active = sorted(invocation.active for invocation in invocations)
+        total = sum(active) or 1
+        return Summary(
+            len(invocations),
+            sum(invocation.failed for invocation in invocations),
+            percentile(active, 50),
+            percentile(active, 95),
+            percentile(active, 99),
+            sum(invocation.steam for invocation in invocations) / total,
+            sum(invocation.discord for invocation in invocations) / total,
+            sum(invocation.user for invocation in invocations),
+        )
+
+    def slowest(self) -> List[str]:
+        """Every command that's been used, slowest first by their p95."""
+        return sorted(self.invocations, key=lambda name: self.summary(name).p95, reverse=True)
@@ -0,0 +1,132 @@
+# -*- coding: utf-8 -*-
+
+import json
+import logging
+import os
+import random
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Any, Callable, Deque, Dict, Iterator, List, Optional
+
+log = logging.getLogger(__name__)
+
+TRACES = Path("logs") / "traces.jsonl"
+MAX_SIZE = 5 * 1024 * 1024  # the trace file is rotated when it gets bigger than this
+BACKUPS = 3
+
+current: ContextVar[Optional["Trace"]] = ContextVar("trace", default=None)
+
+
+class Trace:
+    """The timed spans of one relayed event, from it arriving from Steam to the last message it caused being sent.
+
+    Work that carries on after the handler returns, like the outbox delivering messages, holds the trace
+    open and it's only finished once everything has released it.
+    """
+
+    __slots__ = ("id", "name", "timestamp", "start", "attrs", "spans", "duration", "_holds", "_on_finish")
+
+    def __init__(self, name: str, on_finish: Callable[["Trace"], None], **attrs: Any):
+        self.id = os.urandom(4).hex()
+        self.name = name
+        self.timestamp = time.time()
+        self.start = time.perf_counter()
+        self.attrs = attrs
+        self.spans: List[Dict[str, Any]] = []
+        self.duration: Optional[float] = None
+        self._holds = 0
+        self._on_finish = on_finish
+
+    @contextmanager
+    def span(self, name: str, **attrs: Any) -> Iterator[Dict[str, Any]]:
+        start = time.perf_counter()
+        span = {"name": name, "start": round((start - self.start) * 1000, 3), **attrs}
+        try:
+            yield span
+        except BaseException as exc:
+            span["error"] = type(exc).__name__
+            raise
+        finally:
+            span["duration"] = round((time.perf_counter() - start) * 1000, 3)
+            self.spans.append(span)
+
+    def hold(self) -> None:
+        self._holds += 1
+
+    def release(self) -> None:
+        self._holds -= 1
+        if self._holds == 0 and self.duration is None:
+            self.duration = round((time.perf_counter() - self.start) * 1000, 3)
+            self._on_finish(self)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "id": self.id,
+            "name": self.name,
+            "timestamp": self.timestamp,
+            "duration": self.duration,
+            **self.attrs,
+            "spans": sorted(self.spans, key=lambda span: span["start"]),
+        }
+
+
+@contextmanager
+def span(name: str, **attrs: Any) -> Iterator[Optional[Dict[str, Any]]]:
+    """Time a span of the current trace, doing nothing if this event isn't being traced."""
+    trace = current.get()
+    if trace is None:
+        yield None
+        return
+    with trace.span(name, **attrs) as span:
+        yield span
+
+
+class Tracer:
+    """Samples events to trace and writes the finished traces to a rotating JSONL file."""
+
+    def __init__(self, rate: float = 0.1, path: Path = TRACES):
+        self.rate = rate
+        self.path = path
+        self.recent: Deque[Trace] = deque(maxlen=500)
+
+    @contextmanager
+    def trace(self, name: str, **attrs: Any) -> Iterator[Optional[Trace]]:
+        """Start tracing an event if it's sampled, anything run inside this sees it as the current trace."""
+        if random.random() >= self.rate:
+            yield None
+            return
+        trace = Trace(name, self.finish, **attrs)
+        trace.hold()
+        token = current.set(trace)
+        try:
+            yield trace
+        finally:
+            current.reset(token)
+            trace.release()
+
+    def finish(self, trace: Trace) -> None:
+        self.recent.append(trace)
+        try:
+            self.path.parent.mkdir(exist_ok=True)
+            if self.path.exists() and self.path.stat().st_size > MAX_SIZE:
+                self.rotate()
+            with self.path.open("a", encoding="utf-8") as fp:
+                fp.write(f"{json.dumps(trace.to_dict(), default=str)}\n")
+        except OSError as exc:
+            log.warning("Couldn't write a trace", exc_info=exc)
+
+    def rotate(self) -> None:
+        for number in range(BACKUPS - 1, 0, -1):
+            older = self.path.with_suffix(f".{number}.jsonl")
+            if older.exists():
+                older.replace(self.path.with_suffix(f".{number + 1}.jsonl"))
+        self.path.replace(self.path.with_suffix(".1.jsonl"))
+
+    def slowest(self, count: int = 10) -> List[Trace]:
+        return sorted(self.recent, key=lambda trace: trace.duration, reverse=True)[:count]
+
+    def get(self, id: str) -> Optional[Trace]:
+        return next((trace for trace in reversed(self.recent) if trace.id == id), None)
@@ -0,0 +1,138 @@
+# -*- coding: utf-8 -*-
+
+import json
+import re
+from collections import Counter, OrderedDict
+from typing import Any, Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+import steam
+
+from .prices import Side, count_side, parse_sides
+from .storage import data_path, dump_json, load_json
+
+# (destination kind, destination id, channel id, message id)
+TradeMessage = Tuple[str, int, int, int]
+
+
+def format_items(items: Iterable[Any]) -> str:
+    """One side of an offer the way tf2automatic writes it in its summaries, eg. ``2x Refined Metal, Team Captain``."""
+    counts = Counter(getattr(item, "name", None) or "Unknown Item" for item in items)
+    return ", ".join(f"{count}x {name}" if count > 1 else name for name, count in counts.items()) or "nothing"
+
+
+class TradeMessages:
+    """A bounded LRU map of trade ids to the Discord messages posted about them.
+
+    This lets later updates to a trade edit the message that was already posted instead of
+    posting another one. It is written to disk on every change so it survives restarts.
+    """
+
+    def __init__(self, name: str = "trades", max_size: int = 1000):
+        self.path = data_path(f"{name}.json")
+        self.max_size = max_size
+        self.messages: "OrderedDict[int, List[TradeMessage]]" = OrderedDict(
+            (int(trade_id), [tuple(message) for message in messages])
+            for trade_id, messages in load_json(self.path, default=[])
+        )
+
+    def __len__(self) -> int:
+        return len(self.messages)
+
+    def __contains__(self, trade_id: int) -> bool:
+        return trade_id in self.messages
+
+    def get(self, trade_id: int) -> Optional[List[TradeMessage]]:
+        try:
+            self.messages.move_to_end(trade_id)
+        except KeyError:
+            return None
+        return self.messages[trade_id]
+
+    def add(self, trade_id: int, messages: List[TradeMessage]) -> None:
+        self.messages[trade_id] = messages
+        self.messages.move_to_end(trade_id)
+        while len(self.messages) > self.max_size:
+            self.messages.popitem(last=False)
+        self.save()
+
+    def save(self) -> None:
+        dump_json(self.path, list(self.messages.items()))
+
+
+STATUS = re.compile(r" (?:is|marked as) (?:now )?(\w+)")
+
+
+class Trade(NamedTuple):
+    """What happened in a trade, either read from one of the bots' messages or taken straight from Steam."""
+
+    id: int
+    trader: int
+    status: Optional[str]
+    summary: str
+    sides: Optional[Tuple[Side, Side]]  # asked and offered, None if the message didn't have a summary
+
+    @classmethod
+    def from_message(cls, content: str) -> "Trade":
+        trade_id, trader = re.findall(r"\d+", content)[:2]
+        status = STATUS.search(content)
+        _, _, summary = content.partition("Summary:")
+        return cls(
+            int(trade_id),
+            steam.SteamID(int(trader)).id64,
+            status.group(1) if status is not None else None,
+            " ".join(summary.split()),
+            parse_sides(content),
+        )
+
+    @classmethod
+    def from_offer(cls, trade: steam.TradeOffer, status: str) -> "Trade":
+        return cls(
+            trade.id,
+            trade.partner.id64,
+            status,
+            f"Asked: {format_items(trade.items_to_receive)}. Offered: {format_items(trade.items_to_send)}.",
+            (
+                count_side((item.name, 1) for item in trade.items_to_receive),
+                count_side((item.name, 1) for item in trade.items_to_send),
+            ),
+        )
+
+
+class TradeLog:
+    """An append-only record of every trade that has been relayed, one JSON object per line."""
+
+    def __init__(self, name: str = "trade-log"):
+        self.path = data_path(f"{name}.jsonl")
+
+    def __bool__(self) -> bool:
+        return self.path.exists() and self.path.stat().st_size > 0
+
+    def add(self, timestamp: float, bot: int, trade: Trade) -> None:
+        record = {
+            "timestamp": timestamp,
+            "trade_id": trade.id,
+            "bot": bot,
+            "trader": trade.trader,
+            "status": trade.status,
+            "summary": trade.summary,
+        }
+        with self.path.open("a", encoding="utf-8") as fp:
+            fp.write(f"{json.dumps(record)}\n")
+
+    def read(self, start: Optional[float] = None, end: Optional[float] = None) -> Iterator[Dict[str, Any]]:
+        """Lazily yield the trades between ``start`` and ``end``, a line at a time."""
+        try:
+            fp = self.path.open(encoding="utf-8")
+        except FileNotFoundError:
+            return
+        with fp:
+            for line in fp:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                if start is not None and record["timestamp"] < start:
+                    continue
+                if end is not None and record["timestamp"] >= end:
+                    break  # the log is in time order so nothing after this is in range
+                yield record